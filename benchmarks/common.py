@@ -0,0 +1,58 @@
+"""
+Shared helpers for the benchmarks.
+"""
+
+import numpy as np
+from mesa.space import ContinuousSpace
+
+from src.model import BoidFlockers
+from src.neighbors import CellList, GridSpace
+from src.params import SwarmParams
+
+
+class PlainSpace(GridSpace):
+    """
+    GridSpace answering get_neighbors the O(N) ContinuousSpace way.  The
+    rest of GridSpace (version, move_rows...) is still needed by the swarm
+    stats.
+    """
+
+    def get_neighbors(self, pos, radius, include_center=True):
+        return ContinuousSpace.get_neighbors(self, pos, radius, include_center)
+
+
+def make_model(population, plain_space=False, spacing=SwarmParams.u_start_spacing, **kwargs):
+    """
+    BoidFlockers with a space big enough for the population.
+
+    Args:
+        population: Number of uninformed bees.
+        plain_space: Use mesa's ContinuousSpace neighbor lookup instead of
+            GridSpace's.
+        spacing: Mean distance between the uninformed bees at the start
+            (SwarmParams.u_start_spacing).  The start square grows with
+            sqrt(population), so every population starts at the same
+            density and a bee has about as many neighbors at 20000 bees
+            as at 100.
+        kwargs: Passed to BoidFlockers.
+    """
+    margin = 200
+    side = SwarmParams(u_start_spacing=spacing).start_side(population) + 2 * margin
+    params = SwarmParams(
+        u_start_center=(side / 2, side / 2), u_start_spacing=spacing, goal_x=side + margin, goal_y=side / 2
+    )
+    return BoidFlockers(
+        population=population,
+        width=side + 2 * margin,
+        height=side,
+        params=params,
+        space_cls=PlainSpace if plain_space else GridSpace,
+        **kwargs
+    )
+
+
+def mean_neighbors(model):
+    """Mean number of bees within vision of an uninformed bee."""
+    rows = np.nonzero(model.uninformed)[0]
+    which, _, _, _ = CellList(model.space._agent_points, model.vision).pairs(rows, model.vision)
+    return len(which) / max(1, len(rows))
@@ -0,0 +1,54 @@
+"""
+Per-tick time of BoidFlockers as the population grows.
+
+Compares the plain ContinuousSpace lookup (scans every agent), the agent path
+on the GridSpace index and the array engine on the per-tick CellList.  The
+start square grows with sqrt(population), so every population starts at
+the same density (--spacing, the mean distance between the bees).
+
+    python -m benchmarks.neighbor_scaling
+    python -m benchmarks.neighbor_scaling --populations 100 1000 20000 --ticks 5
+"""
+
+import argparse
+import time
+
+from benchmarks.common import make_model
+from src.params import SwarmParams
+
+POPULATIONS = [100, 500, 1000, 2000, 5000, 10000, 20000]
+
+
+def time_ticks(model, ticks):
+    model.step()  # warm up
+    start = time.perf_counter()
+    for _ in range(ticks):
+        model.step()
+    return (time.perf_counter() - start) / ticks
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--populations", type=int, nargs="+", default=POPULATIONS)
+    parser.add_argument("--ticks", type=int, default=3)
+    parser.add_argument("--spacing", type=float, default=SwarmParams.u_start_spacing,
+                        help="mean distance between the uninformed bees at the start")
+    parser.add_argument("--plain-limit", type=int, default=5000,
+                        help="skip the O(N^2) ContinuousSpace runs above this population")
+    parser.add_argument("--agent-limit", type=int, default=20000,
+                        help="skip the agent path above this population")
+    args = parser.parse_args(argv)
+
+    print("{:>10} {:>16} {:>16} {:>16}".format("population", "plain (s/tick)", "grid (s/tick)", "array (s/tick)"))
+    for population in args.populations:
+        plain = grid = "-"
+        if population <= args.plain_limit:
+            plain = "{:.4f}".format(time_ticks(make_model(population, plain_space=True, spacing=args.spacing, seed=0), args.ticks))
+        if population <= args.agent_limit:
+            grid = "{:.4f}".format(time_ticks(make_model(population, spacing=args.spacing, seed=0), args.ticks))
+        array = "{:.4f}".format(time_ticks(make_model(population, engine="array", spacing=args.spacing, seed=0), args.ticks))
+        print("{:>10} {:>16} {:>16} {:>16}".format(population, plain, grid, array), flush=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,106 @@
+"""
+Startup cost of the headless entry points.
+
+    python -m benchmarks.startup
+    python -m benchmarks.startup --repeat 10 --workers 8
+
+Every sweep worker is a fresh process that imports the model before it runs
+anything, so whatever gets imported on the way is paid once per worker.  For
+each module in MODULES this times the import in a fresh interpreter (median
+of --repeat runs), reports the peak RSS of that interpreter and lists the
+heavy packages (HEAVY) it pulled in.  Then it times a spawn-context process
+pool from creation until every worker built and stepped a small model, which
+is the startup a batch sweep pays before its first result.
+
+The headless modules (model, batch, ensemble) should not load any of HEAVY;
+only the server needs mesa.visualization and tornado, and numba is only
+imported when the numba backend is used.
+"""
+
+import argparse
+import json
+import multiprocessing
+import statistics
+import subprocess
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+MODULES = ("src.model", "src.batch", "src.ensemble", "src.server")
+
+# packages that are expensive to import and not needed headless
+HEAVY = ("mesa.visualization", "tornado", "numba", "pandas", "scipy")
+
+IMPORT_SCRIPT = """
+import json, resource, sys, time
+start = time.perf_counter()
+import {module}
+seconds = time.perf_counter() - start
+heavy = sorted(set(name for name in {heavy!r} if name in sys.modules))
+print(json.dumps({{
+    "seconds": seconds,
+    "peak_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+    "heavy": heavy,
+}}))
+"""
+
+
+def time_import(module, repeat):
+    """Median import time, peak RSS and heavy packages of module in a fresh interpreter."""
+    runs = []
+    for _ in range(repeat):
+        out = subprocess.run(
+            [sys.executable, "-c", IMPORT_SCRIPT.format(module=module, heavy=HEAVY)],
+            check=True, capture_output=True, text=True
+        )
+        runs.append(json.loads(out.stdout))
+    return {
+        "seconds": statistics.median(r["seconds"] for r in runs),
+        "peak_rss_mb": max(r["peak_rss_mb"] for r in runs),
+        "heavy": runs[0]["heavy"],
+    }
+
+
+def _worker_ready(_):
+    # what a batch worker does before its first run finishes
+    from src.batch import make_model
+
+    model = make_model({"population": 20, "scout_population": 2}, seed=0)
+    model.step()
+    return sorted(name for name in HEAVY if name in sys.modules)
+
+
+def time_pool(workers):
+    """Seconds from creating a spawn pool until every worker stepped a model."""
+    start = time.perf_counter()
+    context = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=workers, mp_context=context) as pool:
+        heavy = set()
+        for loaded in pool.map(_worker_ready, range(workers)):
+            heavy.update(loaded)
+        seconds = time.perf_counter() - start
+    return seconds, sorted(heavy)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--modules", nargs="+", default=MODULES)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--workers", type=int, default=4)
+    args = parser.parse_args(argv)
+
+    print("{:>14} {:>12} {:>12}  {}".format("module", "import (s)", "peak RSS MB", "heavy imports"))
+    for module in args.modules:
+        result = time_import(module, args.repeat)
+        print("{:>14} {:>12.3f} {:>12.1f}  {}".format(
+            module, result["seconds"], result["peak_rss_mb"], ", ".join(result["heavy"]) or "-"
+        ), flush=True)
+
+    seconds, heavy = time_pool(args.workers)
+    print("\n{} spawned workers ready in {:.2f} s (heavy imports: {})".format(
+        args.workers, seconds, ", ".join(heavy) or "-"
+    ))
+
+
+if __name__ == "__main__":
+    main()
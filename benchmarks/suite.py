@@ -0,0 +1,194 @@
+"""
+Throughput and scaling benchmarks for BoidFlockers.
+
+    python -m benchmarks.suite run --out bench.json
+    python -m benchmarks.suite run --quick --out bench.json
+    python -m benchmarks.suite compare baseline.json bench.json
+
+"run" steps every configuration in CONFIGS with every engine from a fixed
+seed and records ticks/sec, per-tick latency percentiles, construction time
+(make_agents dominates it), the peak RSS of the process and the mean number
+of neighbors per bee at the end.  Each
+configuration runs in a fresh process so the RSS numbers don't leak into each
+other.
+
+"compare" lines up two result files and flags every configuration that got
+slower or bigger by more than --threshold (10% by default).  It exits with
+status 1 if anything regressed, so it can gate changes to the engine, the
+neighbor index or the caches against the agent-loop baseline.
+"""
+
+import argparse
+import datetime
+import json
+import multiprocessing
+import platform
+import resource
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+SEED = 12345
+
+# spacing is the mean distance between the uninformed bees at the start
+# (SwarmParams.u_start_spacing).  At the default 10 every population starts
+# at the same density, so the big configurations measure swarms as dense as
+# the 100 bee one; the spacing 40 one measures a sparse swarm on purpose.
+CONFIGS = [
+    {"population": 100, "scout_population": 10, "vision": 30, "spacing": 10},
+    {"population": 1000, "scout_population": 10, "vision": 30, "spacing": 10},
+    {"population": 1000, "scout_population": 100, "vision": 30, "spacing": 10},
+    {"population": 1000, "scout_population": 10, "vision": 60, "spacing": 10},
+    {"population": 1000, "scout_population": 10, "vision": 30, "spacing": 40},
+    {"population": 5000, "scout_population": 10, "vision": 30, "spacing": 10},
+    {"population": 20000, "scout_population": 50, "vision": 30, "spacing": 10},
+]
+ENGINES = ("agent", "array")
+
+# (metric, higher is better, noise floor) that compare looks at.  Changes
+# smaller than the floor (in the metric's units) are never flagged, so tiny
+# timings jittering by a large fraction don't count as regressions.
+METRICS = (
+    ("ticks_per_sec", True, 0.0),
+    ("latency_p50_ms", False, 0.5),
+    ("latency_p99_ms", False, 0.5),
+    ("construct_seconds", False, 0.05),
+    ("peak_rss_mb", False, 5.0),
+)
+
+
+def config_name(config):
+    return "n{population}_s{scout_population}_v{vision}_d{spacing}".format(**config)
+
+
+def bench_one(config, engine, ticks, warmup):
+    """Run one configuration (in the current process) and return its result."""
+    # imported here so the parent process doesn't load the model
+    from benchmarks.common import make_model, mean_neighbors
+
+    start = time.perf_counter()
+    model = make_model(engine=engine, seed=SEED, **config)
+    construct = time.perf_counter() - start
+
+    for _ in range(warmup):
+        model.step()
+    latencies = np.empty(ticks)
+    for i in range(ticks):
+        start = time.perf_counter()
+        model.step()
+        latencies[i] = time.perf_counter() - start
+
+    # ru_maxrss is in kB on Linux and bytes on macOS
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    rss_mb = rss / 2 ** 20 if sys.platform == "darwin" else rss / 2 ** 10
+    return {
+        "name": config_name(config),
+        "engine": engine,
+        **config,
+        "ticks": ticks,
+        "ticks_per_sec": ticks / latencies.sum(),
+        "latency_p50_ms": 1000 * np.percentile(latencies, 50),
+        "latency_p90_ms": 1000 * np.percentile(latencies, 90),
+        "latency_p99_ms": 1000 * np.percentile(latencies, 99),
+        "latency_max_ms": 1000 * latencies.max(),
+        "construct_seconds": construct,
+        "peak_rss_mb": rss_mb,
+        # to check the swarm is still as dense as the config meant
+        "mean_neighbors": mean_neighbors(model),
+    }
+
+
+def run(configs, engines, ticks, warmup, agent_limit):
+    results = []
+    spawn = multiprocessing.get_context("spawn")
+    for config in configs:
+        for engine in engines:
+            if engine == "agent" and config["population"] > agent_limit:
+                continue
+            with ProcessPoolExecutor(1, mp_context=spawn) as pool:
+                result = pool.submit(bench_one, config, engine, ticks, warmup).result()
+            print("{name:>18} {engine:>6} {ticks_per_sec:10.2f} ticks/s  p50 {latency_p50_ms:8.2f} ms  "
+                  "p99 {latency_p99_ms:8.2f} ms  build {construct_seconds:6.2f} s  "
+                  "rss {peak_rss_mb:7.1f} MB  neighbors {mean_neighbors:5.1f}".format(**result), flush=True)
+            results.append(result)
+    return results
+
+
+def metadata():
+    return {
+        "date": datetime.datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "platform": platform.platform(),
+        "seed": SEED,
+    }
+
+
+def compare(old, new, threshold):
+    """
+    Return the list of (name, engine, metric, old value, new value) that got
+    worse by more than threshold (a fraction).
+    """
+    old_results = {(r["name"], r["engine"]): r for r in old["results"]}
+    regressions = []
+    print("{:>18} {:>6} {:>18} {:>12} {:>12} {:>8}".format("config", "engine", "metric", "old", "new", "change"))
+    for result in new["results"]:
+        key = (result["name"], result["engine"])
+        if key not in old_results:
+            continue
+        before = old_results[key]
+        for metric, higher_is_better, floor in METRICS:
+            a, b = before[metric], result[metric]
+            change = (b - a) / a if a else 0.0
+            worse = -change if higher_is_better else change
+            flag = "  REGRESSION" if worse > threshold and abs(b - a) > floor else ""
+            print("{:>18} {:>6} {:>18} {:12.3f} {:12.3f} {:+7.1%}{}".format(*key, metric, a, b, change, flag))
+            if flag:
+                regressions.append((*key, metric, a, b))
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    run_parser = commands.add_parser("run", help="run the benchmarks")
+    run_parser.add_argument("--out", default="bench.json")
+    run_parser.add_argument("--ticks", type=int, default=50)
+    run_parser.add_argument("--warmup", type=int, default=5)
+    run_parser.add_argument("--engines", nargs="+", choices=ENGINES, default=list(ENGINES))
+    run_parser.add_argument("--agent-limit", type=int, default=5000,
+                            help="skip the agent engine above this population")
+    run_parser.add_argument("--quick", action="store_true",
+                            help="only the configurations up to 1000 bees, 10 ticks each")
+
+    compare_parser = commands.add_parser("compare", help="flag regressions between two result files")
+    compare_parser.add_argument("old")
+    compare_parser.add_argument("new")
+    compare_parser.add_argument("--threshold", type=float, default=0.1)
+
+    args = parser.parse_args(argv)
+    if args.command == "run":
+        configs = CONFIGS
+        ticks = args.ticks
+        if args.quick:
+            configs = [c for c in CONFIGS if c["population"] <= 1000]
+            ticks = min(ticks, 10)
+        results = run(configs, args.engines, ticks, args.warmup, args.agent_limit)
+        with open(args.out, "w") as f:
+            json.dump({"meta": metadata(), "results": results}, f, indent=2)
+        print("wrote", args.out)
+    else:
+        with open(args.old) as f:
+            old = json.load(f)
+        with open(args.new) as f:
+            new = json.load(f)
+        regressions = compare(old, new, args.threshold)
+        print("{} regression(s)".format(len(regressions)))
+        sys.exit(1 if regressions else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,3 +1,20 @@
-from src.server import server
+import argparse
 
-server.launch()
\ No newline at end of file
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run the bee swarm visualization.")
+    parser.add_argument("--live", action="store_true",
+                        help="run the model in its own thread, viewers only watch (see src/live.py)")
+    parser.add_argument("--tps", type=float, default=None, help="live: ticks per second (default: as fast as it goes)")
+    parser.add_argument("--fps", type=float, default=20, help="live: frames per second sent to viewers")
+    args = parser.parse_args(argv)
+
+    # the visualization (mesa.visualization, tornado...) is only imported
+    # when the server is launched, see src/server.py
+    from src.server import make_server
+
+    make_server(live=args.live, tps=args.tps, fps=args.fps).launch()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,8 +1,56 @@
 # See https://github.com/projectmesa/mesa/blob/main/examples/boid_flockers/boid_flockers/SimpleContinuousModule.py
 # This example is being used a starting point for our project
+import base64
+from time import perf_counter
+
+import numpy as np
 from mesa.visualization.ModularVisualization import VisualizationElement
 from .goal import Goal
 
+
+# How each kind of agent is drawn.  A SimpleCanvas portrayal method can hand
+# out copies of these, BatchedCanvas and the replay send them once per model.
+GROUP_STYLES = {
+    "uninformed": {"Shape": "circle", "r": 2, "Filled": "true", "Color": "Red"},
+    "scout": {"Shape": "circle", "r": 4, "Filled": "true", "Color": "Blue"},
+    "goal": {"Shape": "circle", "r": 6, "Filled": "true", "Color": "Red"},
+}
+
+
+def timed_render(render):
+    """Adds the time spent rendering to the model's profiler, if it has one."""
+    def wrapper(self, model):
+        profiler = getattr(model, "profiler", None)
+        if profiler is None:
+            return render(self, model)
+        start = perf_counter()
+        try:
+            return render(self, model)
+        finally:
+            profiler.add("render", perf_counter() - start)
+    return wrapper
+
+
+def scale_to_canvas(points, x_min, x_max, y_min, y_max, canvas_width, canvas_height):
+    """
+    Scale an (..., 2) array of space coordinates to the coordinates
+    simple_continuous_canvas.js expects, the same way SimpleCanvas.render does
+    for one agent, but for all of them at once.  Returns float32.
+    """
+    scaled = np.empty(points.shape, dtype=np.float32)
+    scaled[..., 0] = (canvas_width / canvas_height) * (points[..., 0] - x_min) / (x_max - x_min)
+    scaled[..., 1] = (canvas_height / canvas_width) * (points[..., 1] - y_min) / (y_max - y_min)
+    return scaled
+
+
+def pack_points(points):
+    """
+    Pack an (N,2) array of canvas coordinates as a base64 string of
+    little-endian float32 x,y pairs, which the canvas decodes into a
+    Float32Array.  Much smaller to send and parse than one dict per agent.
+    """
+    return base64.b64encode(np.ascontiguousarray(points, dtype='<f4').tobytes()).decode('ascii')
+
 class SimpleCanvas(VisualizationElement):
     local_includes = ["src/simple_continuous_canvas.js"]
     portrayal_method = None
@@ -22,14 +70,13 @@ class SimpleCanvas(VisualizationElement):
         )
         self.js_code = "elements.push(" + new_element + ");"
 
+    @timed_render
     def render(self, model):
         space_state = []
         agents = model.schedule.agents
         agents.append(self.goal)
         for obj in agents:
             portrayal = self.portrayal_method(obj)
-            if obj == self.goal:
-                print(portrayal)
             x, y = obj.pos
             x = (self.canvas_width / self.canvas_height) * (x - model.space.x_min) / (model.space.x_max - model.space.x_min)
             y = (self.canvas_height / self.canvas_width) * (y - model.space.y_min) / (model.space.y_max - model.space.y_min)
@@ -44,4 +91,69 @@ class SimpleCanvas(VisualizationElement):
         # goal_portrayal['x'] = x
         # goal_portrayal['y'] = y
         # space_state.append(goal_portrayal)
-        return space_state
\ No newline at end of file
+        return space_state
+
+class BatchedCanvas(VisualizationElement):
+    """
+    Draws a BoidFlockers model like SimpleCanvas, but for big swarms.  Agents
+    are grouped by kind (uninformed, scout, goal), scaled to canvas
+    coordinates in one numpy operation and sent as packed float32 arrays.
+    The styles go out only with the first frame of each model.
+    """
+    local_includes = ["src/simple_continuous_canvas.js"]
+
+    def __init__(self, canvas_height=500, canvas_width=500, every=1, max_points=None, styles=GROUP_STYLES,
+                 styles_every_frame=False):
+        """
+        Args:
+            canvas_height, canvas_width: Size of the canvas in pixels.
+            every: Only send every k-th frame.  The model still steps every
+                time, the canvas just keeps showing the last frame it got.
+            max_points: Draw at most about this many uninformed bees (an
+                evenly spaced subset that stays the same from frame to frame).
+                None draws them all.
+            styles: Portrayal of each group, see GROUP_STYLES.
+            styles_every_frame: Send the styles with every frame, for when
+                one frame goes to viewers that joined at different times
+                (live.py).
+        """
+        self.canvas_height = canvas_height
+        self.canvas_width = canvas_width
+        self.every = max(1, int(every))
+        self.max_points = max_points
+        self.styles = styles
+        self.styles_every_frame = styles_every_frame
+        self.js_code = "elements.push(new Simple_Continuous_Module({}, {}));".format(
+            canvas_width, canvas_height
+        )
+        self._model = None
+        self._frame = 0
+
+    @timed_render
+    def render(self, model):
+        data = {"packed": True}
+        if model is not self._model:
+            # new model (a reset or a reloaded page), send styles with this frame
+            self._model = model
+            self._frame = 0
+            data["styles"] = self.styles
+        elif self._frame % self.every:
+            self._frame += 1
+            return None
+        self._frame += 1
+        if self.styles_every_frame:
+            data["styles"] = self.styles
+
+        space = model.space
+        bounds = (space.x_min, space.x_max, space.y_min, space.y_max, self.canvas_width, self.canvas_height)
+        points = space._agent_points
+        uninformed = np.nonzero(model.uninformed & model.active)[0]
+        if self.max_points and len(uninformed) > self.max_points:
+            uninformed = uninformed[::-(-len(uninformed) // self.max_points)]
+        scouts = np.nonzero(~model.uninformed & model.active)[0]
+        data["points"] = {
+            "uninformed": pack_points(scale_to_canvas(points[uninformed], *bounds)),
+            "scout": pack_points(scale_to_canvas(points[scouts], *bounds)),
+            "goal": pack_points(scale_to_canvas(np.asarray(model.goal, dtype=float)[None, :], *bounds)),
+        }
+        return data
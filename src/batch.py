@@ -0,0 +1,296 @@
+"""
+Headless runs of BoidFlockers and parameter sweeps over a process pool.
+
+No visualization is imported here, so this is the entry point for big sweeps:
+
+    python -m src.batch --population 100 200 --goal-x 900 4000 \\
+        --replicates 100 --workers 8 --out results.csv
+
+Every combination of the swept values is run --replicates times.  Each run
+gets its own seed derived from --seed, the index of its parameter combination
+and its replicate number, so a run gives the same result no matter which
+worker ran it or how many other runs were in the sweep.  A run stops as soon
+as the swarm arrives at the goal (within --arrival-radius, 0 turns that
+off), an uninformed bee gets disconnected from the swarm, every scout has
+left, the swarm settled (only with --settle-speed) or --max-steps is reached
+(see termination.py).  With --keep-disconnected
+disconnected runs keep going and are only tagged with the step they
+disconnected at.  One summary row per run is appended to the output CSV as
+soon as the run finishes.  A run that fails, or whose model can't even be
+built, gets stop_reason "error" and the message in its error column instead
+of stopping the sweep.  The space is fitted to the swept population and goal
+(see layout).  With --metrics the row also gets the mean, std,
+min, max and last value of the streaming swarm metrics (speed toward the
+goal, spread, scouts at the front, path deviation; see metrics.py), computed
+during the run without keeping its trajectory.
+"""
+
+import argparse
+import csv
+import itertools
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+
+import numpy as np
+
+from .metrics import SwarmMetrics, SUMMARY_FIELDS as METRIC_FIELDS
+from .model import BoidFlockers
+from .params import SwarmParams
+from .rng import run_seed
+from .termination import Termination, ERROR
+
+# Parameters that can be swept and their defaults.  Names that are
+# SwarmParams fields go into the model's params, everything else is passed
+# straight through to BoidFlockers.
+SWEEP_DEFAULTS = {
+    "population": 100,
+    "scout_population": 10,
+    "vision": 30,
+    "separation": 15,
+    "min_scout_neighbors": 10,
+    "goal_x": SwarmParams.goal_x,
+    "goal_y": SwarmParams.goal_y,
+    "max_accel": SwarmParams.max_accel,
+    "inertia": SwarmParams.inertia,
+    "close_to_goal": SwarmParams.close_to_goal,
+    "arrival_radius": SwarmParams.arrival_radius,
+    "u_start_spacing": SwarmParams.u_start_spacing,
+}
+
+# room to leave past the goal when the space width is picked from goal_x
+GOAL_MARGIN = 300
+
+# room kept between the uninformed bees' start square and the edges of the
+# space when the space is fitted to the population
+START_MARGIN = 100
+
+SUMMARY_FIELDS = [
+    "run", "point", "replicate", "seed", *SWEEP_DEFAULTS,
+    "stop_reason", "steps", "center_x", "center_y", "distance_to_goal",
+    "n_disconnected", "disconnected_at", "scouts_left", "seconds", "error",
+]
+
+
+def layout(params):
+    """
+    Turn a flat dict of sweep parameters into BoidFlockers arguments.
+
+    The uninformed bees start in a square of side
+    params.start_side(population) around u_start_center.  If that square would come closer than START_MARGIN to
+    the left or bottom edge of the space, the start square and the goal are
+    both moved by the same offset, so the goal stays where the sweep put it
+    relative to the swarm.  The space is made wide enough for the goal and
+    tall enough for the start square, unless params has a width / height.
+
+    Returns:
+        (kwargs, offset): keyword arguments for BoidFlockers (params is a
+        SwarmParams) and the (2,) offset the layout was moved by.
+    """
+    kwargs = dict(params)
+    names = SwarmParams.fields()
+    swarm_params = SwarmParams(**{name: kwargs.pop(name) for name in list(kwargs) if name in names})
+    half = swarm_params.start_side(kwargs.get("population", SWEEP_DEFAULTS["population"])) / 2
+    start = np.array(swarm_params.u_start_center)
+    offset = np.maximum(0.0, half + START_MARGIN - start)
+    if offset.any():
+        start += offset
+        swarm_params = swarm_params.replace(
+            u_start_center=tuple(start.tolist()),
+            goal_x=swarm_params.goal_x + offset[0],
+            goal_y=swarm_params.goal_y + offset[1],
+        )
+    kwargs.setdefault("width", max(1000, swarm_params.goal_x + GOAL_MARGIN))
+    kwargs.setdefault("height", max(400, start[1] + half + START_MARGIN, swarm_params.goal_y + START_MARGIN))
+    kwargs["params"] = swarm_params
+    return kwargs, offset
+
+
+def make_model(params, seed=None, engine="array", **kwargs):
+    """
+    Build a BoidFlockers from a flat dict of sweep parameters, with a space
+    big enough for the population and the goal (see layout).
+    """
+    model_kwargs, _ = layout(params)
+    return BoidFlockers(seed=seed, engine=engine, **model_kwargs, **kwargs)
+
+
+def run_trial(params, seed, max_steps=5000, engine="array", profile_path=None, stop_on_disconnect=True,
+              settle_speed=None, metrics=False):
+    """
+    Run one model until its Termination stops it: it arrives, disconnects,
+    all scouts left, it settled or it hit max_steps (see termination.py).
+
+    Args:
+        params: Sweep parameters, see make_model.
+        seed: Seed of the run.
+        max_steps: Step budget.
+        engine: BoidFlockers engine.
+        profile_path: If given, profile the run and write one JSON line per
+            tick (see profiling.py) to this file.
+        stop_on_disconnect: Stop as soon as an uninformed bee gets
+            disconnected.  If False the run goes on and disconnected_at in
+            the result says when it happened.
+        settle_speed: Also stop once the uninformed bees' mean speed stays
+            below this (Termination's settle_speed).
+        metrics: Keep SwarmMetrics during the run and add its summary
+            (METRIC_FIELDS) to the result.
+
+    Returns:
+        A dict with the stop reason and a summary of the final state.  The
+        center is in the sweep's coordinates (before layout moved it).  A
+        model that couldn't be built gives stop_reason "error" and no state.
+    """
+    start = time.perf_counter()
+    termination = Termination(max_steps, disconnect=stop_on_disconnect, settle_speed=settle_speed)
+    model = None
+    error = ""
+    profile = open(profile_path, "w") if profile_path is not None else None
+    try:
+        model_kwargs, offset = layout(params)
+        model = BoidFlockers(
+            seed=seed, engine=engine, profile=profile is not None, termination=termination,
+            metrics=SwarmMetrics() if metrics else None, **model_kwargs
+        )
+        while model.running:
+            model.step()
+            if profile is not None:
+                profile.write(json.dumps(model.profiler.last) + "\n")
+    except Exception as e:
+        # mostly bees leaving the (non-toroidal) space
+        if model is not None:
+            termination.stop(model, ERROR)
+        error = str(e)
+    finally:
+        if profile is not None:
+            profile.close()
+    if model is None:
+        # it couldn't even be built, the metrics are all nan
+        result = {"seed": seed, "stop_reason": ERROR, "steps": 0}
+        summary = SwarmMetrics().summary() if metrics else {}
+    else:
+        center = model.stats.center
+        result = {
+            "seed": seed,
+            "stop_reason": model.stop_reason,
+            "steps": model.schedule.steps,
+            "center_x": center[0] - offset[0],
+            "center_y": center[1] - offset[1],
+            "distance_to_goal": np.linalg.norm(model.goal - center),
+            "n_disconnected": model.stats.n_disconnected,
+            # first step an uninformed bee was outside the main component
+            "disconnected_at": model.stats.connectivity.disconnected_at,
+            "scouts_left": model.schedule.get_agent_count() - model.population,
+        }
+        summary = model.metrics.summary() if metrics else {}
+    result["seconds"] = time.perf_counter() - start
+    result["error"] = error
+    result.update(summary)
+    return result
+
+
+def grid_points(grid):
+    """Every combination of the values in grid (a dict of name -> list)."""
+    names = list(grid)
+    for values in itertools.product(*(grid[name] for name in names)):
+        yield dict(zip(names, values))
+
+
+def _run(job):
+    (run, point, replicate, params, seed, max_steps, engine, profile_dir, stop_on_disconnect, settle_speed,
+     metrics) = job
+    row = {"run": run, "point": point, "replicate": replicate, **SWEEP_DEFAULTS, **params}
+    profile_path = None
+    if profile_dir is not None:
+        profile_path = os.path.join(profile_dir, "run_{:06d}.jsonl".format(run))
+    row.update(run_trial(params, seed, max_steps, engine, profile_path, stop_on_disconnect, settle_speed, metrics))
+    return row
+
+
+def sweep(grid, replicates, out, workers=None, base_seed=0, max_steps=5000, engine="array", profile_dir=None,
+          stop_on_disconnect=True, settle_speed=None, metrics=False):
+    """
+    Run every point of grid replicates times across a process pool and append
+    one row per finished run to the CSV file out.  Only the runs currently in
+    flight are kept in memory.
+
+    Args:
+        grid: dict of parameter name -> list of values to sweep.  Names not
+            in SWEEP_DEFAULTS are passed to BoidFlockers as well.
+        replicates: Number of seeded runs per parameter combination.
+        out: Path of the CSV file to write.
+        workers: Number of worker processes (default: one per CPU).
+        base_seed: Seed the per-run seeds are derived from.
+        max_steps, engine, stop_on_disconnect, settle_speed, metrics: Passed
+            to run_trial.
+        profile_dir: If given, profile every run and write its per tick
+            records to run_<run>.jsonl in this directory.
+
+    Returns:
+        The number of runs written.
+    """
+    def jobs():
+        run = 0
+        for point, params in enumerate(grid_points(grid)):
+            for replicate in range(replicates):
+                seed = run_seed(base_seed, point, replicate)
+                yield (run, point, replicate, params, seed, max_steps, engine, profile_dir, stop_on_disconnect,
+                       settle_speed, metrics)
+                run += 1
+
+    if profile_dir is not None:
+        os.makedirs(profile_dir, exist_ok=True)
+    fields = SUMMARY_FIELDS + (METRIC_FIELDS if metrics else []) + [name for name in grid if name not in SUMMARY_FIELDS]
+    workers = workers or os.cpu_count()
+    written = 0
+    with open(out, "w", newline="") as f, ProcessPoolExecutor(workers) as pool:
+        writer = csv.DictWriter(f, fields)
+        writer.writeheader()
+        pending = set()
+
+        def write_finished():
+            nonlocal pending, written
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                writer.writerow(future.result())
+                written += 1
+            f.flush()
+
+        # keep a few jobs queued per worker instead of submitting the whole sweep
+        for job in jobs():
+            if len(pending) >= 4 * workers:
+                write_finished()
+            pending.add(pool.submit(_run, job))
+        while pending:
+            write_finished()
+    return written
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    for name, default in SWEEP_DEFAULTS.items():
+        parser.add_argument("--" + name.replace("_", "-"), type=type(default), nargs="+", default=[default])
+    parser.add_argument("--replicates", type=int, default=1)
+    parser.add_argument("--max-steps", type=int, default=5000)
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--seed", type=int, default=0, help="base seed of the sweep")
+    parser.add_argument("--engine", choices=("agent", "array"), default="array")
+    parser.add_argument("--out", default="results.csv")
+    parser.add_argument("--profile-dir", default=None, help="write per tick profiles of every run here")
+    parser.add_argument("--keep-disconnected", action="store_true",
+                        help="don't stop disconnected runs, only record when they disconnected")
+    parser.add_argument("--settle-speed", type=float, default=None,
+                        help="stop runs whose uninformed bees' mean speed stays below this")
+    parser.add_argument("--metrics", action="store_true",
+                        help="add summaries of the streaming swarm metrics (see metrics.py) to every row")
+    args = parser.parse_args(argv)
+
+    grid = {name: getattr(args, name) for name in SWEEP_DEFAULTS}
+    written = sweep(grid, args.replicates, args.out, args.workers, args.seed, args.max_steps, args.engine, args.profile_dir,
+                    not args.keep_disconnected, args.settle_speed, args.metrics)
+    print("wrote {} runs to {}".format(written, args.out))
+
+
+if __name__ == "__main__":
+    main()
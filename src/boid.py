@@ -5,12 +5,10 @@ import numpy as np
 
 from mesa import Agent
 
-# TODO: Make these into model parameters instead of constants
-MAX_ACCEL = 0.3
-VMAX = 1.55
-ALPHA = 0.75
-WEIGHT_RANDOM = 0 # paper turned this off in experiments
-INERTIA = 0.8 # the paper apparently sets this to 0.8
+from .profiling import timed, timed_step
+
+# max_accel, vmax, alpha, weight_random and inertia are in self.model.params
+# (see params.py)
 
 class Boid(Agent):
     """
@@ -61,6 +59,7 @@ class Boid(Agent):
         self.separate_factor = separate
         self.match_factor = match
 
+    @timed("cohere")
     def cohere(self, neighbors):
         """
         Return the vector toward the center of mass of the local neighbors.
@@ -84,6 +83,7 @@ class Boid(Agent):
         return cohere
 
     # This corresponds to "Avoid" in the paper
+    @timed("separate")
     def separate(self, neighbors):
         """
         Return a vector away from any neighbors closer than separation dist.
@@ -100,24 +100,21 @@ class Boid(Agent):
                 separation_vector += delta * (self.separation / np.linalg.norm(delta) - 1)
             separation_vector /= len(them)
             separation_vector /= self.separation
-            separation_vector = separation_vector / np.linalg.norm(separation_vector) ** ALPHA
+            separation_vector = separation_vector / np.linalg.norm(separation_vector) ** self.model.params.alpha
         return separation_vector
 
     def random(self):
         # This doesn't behave exactly like the paper but it seems
-        # like a pretty reasonable / similar alternative.  I don't
-        # know of a built in function that does what they did and I'm
-        # not sure how to create my own.  The idea is that random never
-        # contributes more than 1.
-        beta = np.random.exponential(.5)
-        while(beta > 1):
-            beta = np.random.exponential(.5)
-        r = np.random.uniform(low=-1.0, high=1.0, size=2)
-        r = r / np.linalg.norm(r)
-        return beta * r
+        # like a pretty reasonable / similar alternative.  The idea is
+        # that random never contributes more than 1.  The numbers come
+        # from this bee's row of the tick's block (see rng.py), so they
+        # don't depend on the order the bees step in.
+        row = self.model.space._agent_to_index[self]
+        return self.model.rng.random_walk(self.model.schedule.steps, [row])[0]
 
 
     # This corresponds to "Align" in the paper
+    @timed("align")
     def match_heading(self, neighbors):
         """
         Return a vector of the neighbors' average heading.
@@ -127,24 +124,26 @@ class Boid(Agent):
             for neighbor in neighbors:
                 match_vector += neighbor.velocity
             match_vector /= len(neighbors)
-            match_vector /= VMAX
+            match_vector /= self.model.params.vmax
         return match_vector
 
+    @timed_step("uninformed")
     def step(self):
         """
         Get the Boid's neighbors, compute the new vector, and move accordingly.
         """
+        params = self.model.params
         # The paper does not do the align behavior for the first few steps
         neighbors = self.model.space.get_neighbors(self.pos, self.vision, False)
         v_new = (
             self.cohere(neighbors) * self.cohere_factor
             + self.separate(neighbors) * self.separate_factor
             + (self.match_heading(neighbors) * self.match_factor if self.model.schedule.steps > 4 else 0)
-            + self.random() * WEIGHT_RANDOM
+            + (self.random() * params.weight_random if params.weight_random else 0)
         )
-        if np.linalg.norm(v_new) > MAX_ACCEL:
-            v_new = MAX_ACCEL * v_new / np.linalg.norm(v_new)
-        self.velocity = self.velocity * INERTIA + v_new
+        if np.linalg.norm(v_new) > params.max_accel:
+            v_new = params.max_accel * v_new / np.linalg.norm(v_new)
+        self.velocity = self.velocity * params.inertia + v_new
         # speed will always be 1 here, which is the default value
         # it may be more clear if it's just removed in the future
         new_pos = self.pos + self.velocity * self.speed
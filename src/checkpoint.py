@@ -0,0 +1,218 @@
+"""
+Save a BoidFlockers run to disk and pick it up again later.
+
+    checkpoint.save(model, "run.ckpt")
+    ...
+    model = checkpoint.load("run.ckpt")     # continues bit for bit
+
+A checkpoint is a single uncompressed .npz file: the positions and
+velocities of every space row, which agents are still active and in what
+order the scheduler holds them, the scouts' leave counters, the step count,
+the state of model.random (the scheduler's shuffle), the entropy of model.rng,
+what model.metrics accumulated so far and the model's constructor arguments.  model.rng draws by tick (see rng.py),
+so it has no state of its own to save.  Loading builds a
+new model from those arguments and overwrites its state, so the restored run
+takes exactly the same steps as the original would have.
+
+One warmed-up checkpoint can seed many variant runs, which skips
+re-simulating the shared prefix:
+
+    ckpt = checkpoint.Checkpoint.load("warm.ckpt")
+    for model in ckpt.fork([{"seed": 1}, {"seed": 2}, {"params": faster}]):
+        while model.running:
+            model.step()
+"""
+
+import copy
+import json
+import os
+from collections import OrderedDict
+
+import numpy as np
+
+from .metrics import SwarmMetrics
+from .model import BoidFlockers
+from .params import SwarmParams
+from .recorder import model_params
+from .rng import SwarmRandom
+from .termination import Termination
+
+FORMAT_VERSION = 2
+
+
+class Checkpoint:
+    """
+    A snapshot of the full state of a BoidFlockers model.
+
+    Attributes:
+        params: The model's constructor arguments (see recorder.model_params).
+        arrays: dict of the state arrays.
+        state: dict of the rest of the state (steps, RNG scalars...).
+    """
+
+    def __init__(self, params, arrays, state):
+        self.params = params
+        self.arrays = arrays
+        self.state = state
+
+    @classmethod
+    def capture(cls, model):
+        """Take a snapshot of model (copies everything)."""
+        space = model.space
+        n_rows = len(space._agent_points)
+        unique_ids = np.empty(n_rows, dtype=np.int64)
+        leave_counter = np.full(n_rows, -1, dtype=np.int64)
+        for agent, row in space._agent_to_index.items():
+            unique_ids[row] = agent.unique_id
+            if not model.uninformed[row]:
+                leave_counter[row] = agent.leave_counter
+        version, mt_state, gauss_next = model.random.getstate()
+        arrays = {
+            "position": np.array(space._agent_points, dtype=float),
+            "velocity": np.array(model.get_velocities(), dtype=float),
+            "active": model.active.copy(),
+            "unique_ids": unique_ids,
+            "leave_counter": leave_counter,
+            # scheduler order matters, RandomActivation shuffles it
+            "schedule": np.array(list(model.schedule._agents), dtype=np.int64),
+            "random_state": np.array(mt_state, dtype=np.uint32),
+        }
+        state = {
+            "format_version": FORMAT_VERSION,
+            "steps": model.schedule.steps,
+            "time": model.schedule.time,
+            "running": model.running,
+            "stop_reason": model.stop_reason,
+            "disconnected_at": model.stats.connectivity.disconnected_at,
+            "random_version": version,
+            "random_gauss_next": gauss_next,
+            # the entropy, not the seed, so an unseeded run restores too
+            "rng_entropy": int(model.rng.seed_sequence.entropy),
+            "rng_spawn_key": list(model.rng.seed_sequence.spawn_key),
+        }
+        if model.metrics is not None:
+            state["metrics"] = model.metrics.state()
+        return cls(model_params(model), arrays, state)
+
+    def save(self, path):
+        """Write the checkpoint to path (atomically, via a temporary file)."""
+        meta = json.dumps({"params": self.params, "state": self.state})
+        tmp = path + ".tmp"
+        with open(tmp, "wb") as f:
+            np.savez(f, meta=np.array(meta), **self.arrays)
+        os.replace(tmp, path)
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as data:
+            meta = json.loads(str(data["meta"]))
+            arrays = {name: data[name] for name in data.files if name != "meta"}
+        if meta["state"]["format_version"] != FORMAT_VERSION:
+            raise ValueError("unsupported checkpoint format {}".format(meta["state"]["format_version"]))
+        return cls(meta["params"], arrays, meta["state"])
+
+    def restore(self, seed=None, params=None, **kwargs):
+        """
+        Build a model in the checkpointed state.
+
+        Args:
+            seed: Reseed both RNGs with this instead of restoring their
+                state, so forks of one checkpoint diverge.
+            params: SwarmParams to continue with instead of the checkpoint's.
+            kwargs: Extra BoidFlockers arguments (profile, termination,
+                backend...).  A termination is checked once the state is
+                restored.  The checkpointed metrics continue unless
+                metrics is given (False to drop them, a SwarmMetrics to
+                start over).
+        """
+        arguments = dict(self.params)
+        swarm_params = SwarmParams(**arguments.pop("swarm_params"))
+        # goal and vmax are in swarm_params already
+        arguments.pop("goal")
+        arguments.pop("vmax")
+        arguments.update(kwargs)
+        termination = arguments.pop("termination", None)
+        # attached after the state is restored, a new model would measure
+        # its starting state
+        metrics = arguments.pop("metrics", False)
+        model = BoidFlockers(params=params or swarm_params, **arguments)
+        self._restore_state(model)
+        if metrics is True:
+            metrics = SwarmMetrics.from_state(self.state["metrics"]) if "metrics" in self.state else SwarmMetrics()
+        model.metrics = metrics or None
+        if seed is not None:
+            model._seed = seed
+            model.random.seed(seed)
+            model.rng = SwarmRandom(seed, model.rng.size)
+        if termination is True:
+            termination = Termination()
+        model.termination = termination or None
+        if model.termination is not None and model.running:
+            model.termination.check(model)
+        return model
+
+    def _restore_state(self, model):
+        arrays = self.arrays
+        state = self.state
+        space = model.space
+        agents = {agent.unique_id: (agent, row) for agent, row in space._agent_to_index.items()}
+        unique_ids = arrays["unique_ids"]
+        if len(unique_ids) != len(space._agent_points) or any(uid not in agents for uid in unique_ids.tolist()):
+            raise ValueError("checkpoint doesn't match the model's agents")
+
+        position = arrays["position"]
+        velocity = arrays["velocity"]
+        rows = np.array([agents[uid][1] for uid in unique_ids.tolist()])
+        space.move_rows(rows, position)
+        engine = model.engine
+        for uid, pos, vel, counter in zip(unique_ids.tolist(), position, velocity, arrays["leave_counter"].tolist()):
+            agent, row = agents[uid]
+            agent.pos = pos.copy()
+            if not model.uninformed[row]:
+                # scouts' velocity never changes from the [vmax, 0] they are
+                # built with, which also keeps it right for a params variant
+                agent.leave_counter = counter
+            elif engine is not None:
+                engine.velocity[row] = vel
+                agent.velocity = engine.velocity[row]
+            else:
+                agent.velocity = vel.copy()
+        model.active[rows] = arrays["active"]
+
+        schedule = model.schedule
+        schedule._agents = OrderedDict((uid, agents[uid][0]) for uid in arrays["schedule"].tolist())
+        schedule.steps = state["steps"]
+        schedule.time = state["time"]
+        model.running = state["running"]
+        model.stop_reason = state["stop_reason"]
+
+        model.random.setstate((
+            state["random_version"],
+            tuple(int(x) for x in arrays["random_state"]),
+            state["random_gauss_next"],
+        ))
+        model.rng = SwarmRandom(
+            np.random.SeedSequence(state["rng_entropy"], spawn_key=tuple(state["rng_spawn_key"])),
+            model.rng.size
+        )
+        model.stats.invalidate()
+        model.stats.connectivity.disconnected_at = state["disconnected_at"]
+
+    def fork(self, variants, **kwargs):
+        """
+        Yield one restored model per variant, a dict of restore arguments
+        (seed, params...) on top of kwargs.  Every model gets its own copy of
+        kwargs, so one Termination can be given for all of them.
+        """
+        for variant in variants:
+            yield self.restore(**{**copy.deepcopy(kwargs), **variant})
+
+
+def save(model, path):
+    """Checkpoint model to path."""
+    Checkpoint.capture(model).save(path)
+
+
+def load(path, **kwargs):
+    """Restore the model checkpointed at path, see Checkpoint.restore."""
+    return Checkpoint.load(path).restore(**kwargs)
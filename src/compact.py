@@ -0,0 +1,131 @@
+"""
+Slim agents for very large swarms.
+
+    model = BoidFlockers(population=100000, engine="array", compact=True)
+
+A Boid keeps its position and velocity as two small numpy arrays of its own
+plus speed, vision, separation and the three factors in its instance dict,
+which is a few hundred bytes per bee, and the array engine has to hand every
+bee fresh pos / velocity arrays after each tick.  CompactBoid and
+CompactScout have no instance dict at all, only __slots__ for their ids and
+their space row.  pos and velocity are views of that row in the model's
+buffers (model.space._agent_points and model.velocity) and the shared
+parameters are read from the model, so there is nothing to copy after a
+tick.
+
+To stay dict-free they can't inherit from mesa's Agent (or Boid / Scout),
+which have no __slots__.  They have the same interface instead (unique_id,
+model, pos, step, advance, random) and share Boid's and Scout's methods, so
+the scheduler, the space and the server work on them unchanged.  They are
+not isinstance of Boid / Scout; use model.uninformed to tell the two kinds
+of bee apart.
+
+Since pos and velocity are views, they change when the bee moves.  Copy them
+if you need the old value after a step.  Assigning to them writes into the
+buffers (the space already did that when it set pos).
+"""
+
+from mesa import Agent
+
+from .boid import Boid
+from .scout import Scout
+
+
+class CompactAgent:
+    """
+    Slot-only stand-in for mesa's Agent whose pos and velocity are rows of
+    the model's (N,2) buffers.
+
+    Attributes:
+        row: Row of the bee in model.space._agent_points and model.velocity.
+    """
+
+    __slots__ = ("unique_id", "model", "row")
+
+    def __init__(self, unique_id, model, row):
+        """
+        Args:
+            unique_id: Unique agent identifyer.
+            model: A BoidFlockers built with compact=True.
+            row: The row the space will give the bee (it has to be placed
+                in the same order as the rows).
+        """
+        self.unique_id = unique_id
+        self.model = model
+        self.row = row
+
+    @property
+    def pos(self):
+        return self.model.space._agent_points[self.row]
+
+    @pos.setter
+    def pos(self, value):
+        # the space sets None when the agent is removed
+        if value is not None:
+            self.model.space._agent_points[self.row] = value
+
+    @property
+    def velocity(self):
+        return self.model.velocity[self.row]
+
+    @velocity.setter
+    def velocity(self, value):
+        self.model.velocity[self.row] = value
+
+    advance = Agent.advance
+
+
+class CompactBoid(CompactAgent):
+    """Boid whose state lives in the model's (N,2) buffers."""
+
+    __slots__ = ()
+
+    # shared by every bee, read from the model
+    speed = property(lambda self: self.model.speed)
+    vision = property(lambda self: self.model.vision)
+    separation = property(lambda self: self.model.separation)
+    cohere_factor = property(lambda self: self.model.factors['cohere'])
+    separate_factor = property(lambda self: self.model.factors['separate'])
+    match_factor = property(lambda self: self.model.factors['match'])
+
+    cohere = Boid.cohere
+    separate = Boid.separate
+    random = Boid.random
+    match_heading = Boid.match_heading
+    step = Boid.step
+
+
+class CompactScout(CompactAgent):
+    """
+    Scout whose state lives in the model's (N,2) buffers.
+
+    Attributes:
+        leave_counter: Same as Scout.leave_counter.
+    """
+
+    __slots__ = ("leave_counter",)
+
+    def __init__(self, unique_id, scout_id, model, row):
+        """
+        Args:
+            unique_id: Unique agent identifyer.
+            scout_id: Used to determine when to leave.
+            model: A BoidFlockers built with compact=True.
+            row: The row the space will give the scout.
+        """
+        super().__init__(unique_id, model, row)
+        self.leave_counter = scout_id
+
+    # scouts always move at max speed
+    speed = property(lambda self: self.model.speed * self.model.vmax)
+    vision = property(lambda self: self.model.vision)
+    min_neighbors = property(lambda self: self.model.min_scout_neighbors)
+    goal = property(lambda self: self.model.goal)
+    random = Agent.random
+
+    get_center = Scout.get_center
+    get_furthest_uninformed_x = Scout.get_furthest_uninformed_x
+    reset = Scout.reset
+    towards_goal = Scout.towards_goal
+    disappear = Scout.disappear
+    step = Scout.step
@@ -0,0 +1,185 @@
+"""
+Incremental connected components of the vision-radius neighbor graph.
+
+Two bees are connected if they are within vision of each other.  Recomputing
+the components from scratch needs every neighbor pair of every bee each tick.
+ConnectivityTracker keeps a spanning forest of the graph instead: if every
+edge of the forest is still shorter than vision (and both its bees are still
+active) then every old component is still connected, so components can only
+have merged since the last tick.  A merge edge always has at least one end
+outside the main component, so only the bees outside the main component need
+a neighbor query, which is usually none or a handful.  When a forest edge
+broke the components are recomputed from scratch.
+
+The forest is built from the shortest edges first (in a few length bands) so
+its edges have as much slack as possible and survive many ticks.
+
+Labels are canonical: every bee is labelled with the smallest row in its
+component, whether it was computed incrementally or from scratch.
+"""
+
+import numpy as np
+
+
+def spanning_forest(n, i, j, parent=None):
+    """
+    Label the connected components of the graph with nodes 0..n-1 and edges
+    (i[k], j[k]) and pick a spanning forest, the same way as
+    stats.connected_components.
+
+    Args:
+        n: Number of nodes.
+        i, j: Edge end points.
+        parent: Labels to start from (e.g. from a previous call).  Every node
+            must be labelled with the smallest node of a connected set it
+            belongs to.  Defaults to every node being its own component.
+
+    Returns:
+        (labels, tree) where labels are the smallest node of each node's
+        component and tree are the indices of the edges in the forest (the
+        ones that joined two components).
+    """
+    parent = np.arange(n) if parent is None else parent.copy()
+    tree = []
+    edges = np.arange(len(i))
+    while True:
+        # hook the root with the bigger number under the smaller one
+        a = parent[i]
+        b = parent[j]
+        differ = a != b
+        if not differ.any():
+            break
+        edges = edges[differ]
+        i, j, a, b = i[differ], j[differ], a[differ], b[differ]
+        lo = np.minimum(a, b)
+        hi = np.maximum(a, b)
+        np.minimum.at(parent, hi, lo)
+        # every root that got hooked did so through (at least) one edge,
+        # keep one of them per root
+        used = np.nonzero(parent[hi] == lo)[0]
+        _, first = np.unique(hi[used], return_index=True)
+        tree.append(edges[used[first]])
+        # pointer jumping until every node points straight at its root
+        while True:
+            grand = parent[parent]
+            if np.array_equal(grand, parent):
+                break
+            parent = grand
+    tree = np.concatenate(tree) if tree else np.empty(0, dtype=int)
+    return parent, tree
+
+
+class ConnectivityTracker:
+    """
+    Connected components of the active points within radius of each other,
+    updated incrementally from tick to tick.
+
+    Attributes:
+        labels: Component label per row (smallest row in the component,
+            inactive rows are labelled by themselves).
+        main_label: Label of the biggest component.
+        main_component: Rows of the biggest component.
+        n_components: Number of components among the active rows.
+        centroid: Mean position of the main component.
+        n_disconnected: Number of watched active rows outside the main
+            component.
+        disconnected_at: Tick of the first update that found a watched row
+            outside the main component, or None.
+        on_disconnect: Callables called as f(tracker, tick) at that update.
+        incremental: Whether the last update was incremental.
+        queries, found: Neighbor queries and pairs found by the last update.
+    """
+
+    def __init__(self, radius, bands=(0.5, 0.75, 1.0)):
+        """
+        Args:
+            radius: Connection radius (the bees' vision).
+            bands: Fractions of radius.  Edges shorter than the first band
+                are put into the forest first, then the next band, and so on.
+        """
+        self.radius = radius
+        self.bands = bands
+        self.labels = None
+        self.main_label = None
+        self.disconnected_at = None
+        self.on_disconnect = []
+        self.incremental = False
+        self.full_updates = 0
+        self.incremental_updates = 0
+        self._active = None
+        self._tree_i = self._tree_j = np.empty(0, dtype=int)
+
+    def _forest_intact(self, points, active):
+        if self.labels is None or len(points) != len(self.labels):
+            return False
+        if not np.array_equal(active, self._active):
+            return False
+        delta = points[self._tree_i] - points[self._tree_j]
+        return bool((delta[:, 0] ** 2 + delta[:, 1] ** 2 <= self.radius ** 2).all())
+
+    def update(self, index, active, watch=None, tick=None):
+        """
+        Bring the components up to date with the points of index.
+
+        Args:
+            index: CellList over the current points (neighbors.CellList).
+            active: Bool mask of the rows that take part.
+            watch: Bool mask of the rows counted by n_disconnected (all
+                active rows by default).
+            tick: Tick number passed to disconnect listeners.
+
+        Returns:
+            The labels.
+        """
+        points = index.points
+        n = len(points)
+        rows = np.nonzero(active)[0]
+        if self._forest_intact(points, active):
+            # old components are still connected, look for merges only
+            outside = rows[self.labels[rows] != self.main_label]
+            which, j, _, dist = index.pairs(outside, self.radius)
+            i = outside[which]
+            keep = active[j] & (self.labels[i] != self.labels[j])
+            i, j, dist = i[keep], j[keep], dist[keep]
+            parent = self.labels
+            tree_i, tree_j = [self._tree_i], [self._tree_j]
+            self.queries = len(outside)
+            self.incremental = True
+            self.incremental_updates += 1
+        else:
+            which, j, _, dist = index.pairs(rows, self.radius)
+            i = rows[which]
+            keep = active[j]
+            i, j, dist = i[keep], j[keep], dist[keep]
+            parent = None
+            tree_i, tree_j = [], []
+            self.queries = len(rows)
+            self.incremental = False
+            self.full_updates += 1
+        self.found = len(i)
+
+        # shortest edges first, so the forest lasts
+        done = np.zeros(len(i), dtype=bool)
+        for band in self.bands:
+            short = np.nonzero(~done & (dist <= band * self.radius))[0]
+            parent, tree = spanning_forest(n, i[short], j[short], parent)
+            tree_i.append(i[short[tree]])
+            tree_j.append(j[short[tree]])
+            done[short] = True
+        self.labels = parent
+        self._tree_i = np.concatenate(tree_i)
+        self._tree_j = np.concatenate(tree_j)
+        self._active = active.copy()
+
+        sizes = np.bincount(parent[rows], minlength=n)
+        self.main_label = sizes.argmax()
+        self.main_component = rows[parent[rows] == self.main_label]
+        self.n_components = np.count_nonzero(sizes)
+        self.centroid = points[self.main_component].mean(axis=0)
+        watched = active if watch is None else active & watch
+        self.n_disconnected = np.count_nonzero(watched & (parent != self.main_label))
+        if self.n_disconnected > 0 and self.disconnected_at is None:
+            self.disconnected_at = tick
+            for listener in self.on_disconnect:
+                listener(self, tick)
+        return parent
@@ -0,0 +1,281 @@
+"""
+Array-backed stepping for the uninformed bees.
+
+The agent path (RandomActivation + Boid.step) does a get_neighbors call and
+three Python loops per bee per tick.  The engine here keeps every position and
+velocity in (N,2) numpy arrays and computes cohere / avoid / align / random,
+the max_accel clamp and the inertia update for many bees at once.  The Mesa
+agents are still kept around (and kept up to date) so the scouts, the server
+and the portrayal code keep working unchanged.
+
+Update semantics
+----------------
+There are two ways to order the updates inside a tick and they do not give the
+same trajectories, so the choice is explicit:
+
+    "synchronous"  Every uninformed bee computes its new velocity from the same
+                   snapshot of the swarm (positions/velocities at the start of
+                   the tick), then all of them move at once.  The scouts then
+                   step one at a time in random order.  They read the swarm
+                   center, furthest x, min x and their neighbor counts from
+                   model.stats, the snapshot taken at the start of the tick
+                   (stats.SwarmStats), so they don't see the moved swarm
+                   either.  This is the fast mode and is how the paper describes the
+                   model (all bees update "simultaneously").
+    "sequential"   Random-sequential, exactly like RandomActivation: agents
+                   are activated one at a time in a shuffled order and each bee
+                   sees the moves of the bees before it.  It shuffles with
+                   model.random like the agent path and the random walk
+                   comes from model.rng by row either way, so with the same
+                   seed it reproduces it (up to floating point summation
+                   order).  It is only vectorized per bee, so it is meant for
+                   checking the engine against the agent path, not for speed.
+
+Backends
+--------
+The synchronous update computes the forces with numpy over the cell list's
+neighbor pairs ("numpy") or, with numba installed, with the compiled kernel
+in kernels.py that scans the cell list directly ("numba").  They agree to
+floating point rounding.  The sequential update always uses numpy.
+"""
+
+import warnings
+from time import perf_counter
+
+import numpy as np
+
+from . import kernels
+
+SYNCHRONOUS = "synchronous"
+SEQUENTIAL = "sequential"
+UPDATE_MODES = (SYNCHRONOUS, SEQUENTIAL)
+
+NUMPY = "numpy"
+NUMBA = "numba"
+BACKENDS = (NUMPY, NUMBA)
+
+
+def pair_sum(which, values, k):
+    """Sum the (P,2) per-pair values into a (k,2) array, grouped by which."""
+    out = np.zeros((k, 2))
+    if len(which):
+        out[:, 0] = np.bincount(which, values[:, 0], minlength=k)
+        out[:, 1] = np.bincount(which, values[:, 1], minlength=k)
+    return out
+
+
+def steering(k, which, j, delta, dist, vel, vision, separation, factors, alpha, vmax, max_accel,
+             align=True, random=None):
+    """
+    The Boid.step steering rules for k bees at once: cohere, avoid, align and
+    the random term combined and clamped to max_accel.
+
+    Args:
+        k, which, j, delta, dist, vel: See ArrayEngine.accelerations.
+        vision, separation: Boid vision and separation distance.
+        factors: dict with the cohere, separate and match weights.
+        alpha, vmax, max_accel: SwarmParams values.  Each can be a scalar
+            or a (k,) array with one value per bee.
+        align: Include the align term.
+        random: (k,2) random terms, already weighted, or None.
+    """
+    count = np.bincount(which, minlength=k)
+    safe_count = np.maximum(count, 1)[:, None]
+
+    cohere = pair_sum(which, delta, k) / safe_count / vision
+
+    close = dist < separation
+    n_close = np.bincount(which[close], minlength=k)
+    weight = separation / dist[close] - 1
+    separate = -pair_sum(which[close], weight[:, None] * delta[close], k)
+    separate /= np.maximum(n_close, 1)[:, None]
+    separate /= separation
+    has_close = n_close > 0
+    norm = np.linalg.norm(separate[has_close], axis=1)
+    separate[has_close] /= (norm ** np.broadcast_to(alpha, (k,))[has_close])[:, None]
+
+    v_new = cohere * factors['cohere'] + separate * factors['separate']
+    if align:
+        v_new += pair_sum(which, vel[j], k) / safe_count / np.reshape(vmax, (-1, 1)) * factors['match']
+    if random is not None:
+        v_new += random
+
+    norm = np.linalg.norm(v_new, axis=1)
+    limit = np.broadcast_to(max_accel, (k,))
+    too_fast = norm > limit
+    v_new[too_fast] *= (limit[too_fast] / norm[too_fast])[:, None]
+    return v_new
+
+
+class ArrayEngine:
+    """
+    Steps all uninformed bees of a BoidFlockers model using numpy arrays.
+    Scouts are still stepped through Scout.step.
+    """
+
+    def __init__(self, model, update=SYNCHRONOUS, backend=NUMPY):
+        """
+        Args:
+            model: The BoidFlockers model to step.  Its agents must already
+                be created and placed.
+            update: "synchronous" or "sequential", see the module docstring.
+            backend: "numpy" or "numba", see the module docstring.  "numba"
+                falls back to "numpy" with a warning if numba isn't installed.
+        """
+        if update not in UPDATE_MODES:
+            raise ValueError("update must be one of {}, got {!r}".format(UPDATE_MODES, update))
+        if backend not in BACKENDS:
+            raise ValueError("backend must be one of {}, got {!r}".format(BACKENDS, backend))
+        if backend == NUMBA and not kernels.HAVE_NUMBA:
+            warnings.warn("numba is not installed, using the numpy backend")
+            backend = NUMPY
+        space = model.space
+        if space.torus or not hasattr(space, 'cell_size'):
+            raise ValueError("the array engine needs a non-toroidal GridSpace")
+        self.model = model
+        self.update = update
+        self.backend = backend
+        # Rows of space._agent_points belonging to the uninformed bees.  All
+        # the arrays below are indexed the same way as space._agent_points.
+        self.boids = [a for a in model.schedule.agents if model.uninformed[space._agent_to_index[a]]]
+        self.boid_rows = np.array([space._agent_to_index[b] for b in self.boids], dtype=int)
+        self._row_of = {b.unique_id: r for b, r in zip(self.boids, self.boid_rows)}
+        if model.compact:
+            # the compact agents' velocities already are such an array
+            self.velocity = model.velocity
+        else:
+            self.velocity = np.zeros_like(space._agent_points, dtype=float)
+            for agent, row in space._agent_to_index.items():
+                self.velocity[row] = agent.velocity
+
+    @property
+    def position(self):
+        return self.model.space._agent_points
+
+    def accelerations(self, rows, which, j, delta, dist, vel):
+        """
+        Return the (k, 2) clamped steering vectors (cohere, avoid, align and
+        random combined) for the k bees at rows given all their neighbor pairs.
+
+        Args:
+            rows: Rows of the bees being updated.
+            which, j, delta, dist: Neighbor pairs as returned by
+                CellList.pairs.  which says which of the k bees the pair
+                belongs to, j is the row of the neighbor, delta the heading
+                from the bee to the neighbor and dist its length.
+            vel: (M,2) velocities of all points.
+        """
+        model = self.model
+        params = model.params
+        return steering(
+            len(rows), which, j, delta, dist, vel, model.vision, model.separation, model.factors,
+            params.alpha, params.vmax, params.max_accel,
+            # The paper does not do the align behavior for the first few steps
+            align=model.schedule.steps > 4,
+            random=self.random_walk(rows)
+        )
+
+    def random_walk(self, rows):
+        """The weighted random terms of the bees at rows, None if weighted 0."""
+        model = self.model
+        weight = model.params.weight_random
+        if not weight:
+            return None
+        return model.rng.random_walk(model.schedule.steps, rows) * weight
+
+    def _kernel_random(self, rows):
+        # the kernel always adds a random term
+        random = self.random_walk(rows)
+        return np.zeros((len(rows), 2)) if random is None else random
+
+    def step(self):
+        if self.update == SYNCHRONOUS:
+            self._step_synchronous()
+        else:
+            self._step_sequential()
+        self.model.schedule.steps += 1
+        self.model.schedule.time += 1
+
+    def _step_synchronous(self):
+        model = self.model
+        space = model.space
+        rows = self.boid_rows
+        profiler = model.profiler
+        if profiler is not None:
+            start = perf_counter()
+        pos = self.position
+        # one cell list per tick, every bee reads the same snapshot.  The
+        # model's swarm stats already built one for the start of this tick.
+        index = model.stats.index
+        if self.backend == NUMBA:
+            # the kernel finds the neighbors and sums the forces in one pass,
+            # all of it is timed as forces
+            params = model.params
+            if profiler is not None:
+                now = perf_counter()
+            v_new, found = kernels.steer_cells(
+                index, rows, self.velocity, model.vision, model.separation, model.factors,
+                params.alpha, params.vmax, params.max_accel,
+                align=model.schedule.steps > 4,
+                random=self._kernel_random(rows)
+            )
+            if profiler is not None:
+                profiler.neighbor_query(found, len(rows))
+        else:
+            pairs = index.pairs(rows, model.vision)
+            if profiler is not None:
+                now = perf_counter()
+                profiler.add("neighbors", now - start)
+                profiler.neighbor_query(len(pairs[0]), len(rows))
+            v_new = self.accelerations(rows, *pairs, self.velocity)
+        self.velocity[rows] = self.velocity[rows] * model.params.inertia + v_new
+        if profiler is not None:
+            profiler.add("forces", perf_counter() - now)
+            now = perf_counter()
+        new_pos = space.move_rows(rows, pos[rows] + self.velocity[rows] * model.speed)
+        self._sync_agents(new_pos)
+        if profiler is not None:
+            profiler.add("move", perf_counter() - now)
+            profiler.add_agent("uninformed", perf_counter() - start)
+        for agent in model.schedule.agent_buffer(shuffled=True):
+            if agent.unique_id not in self._row_of:
+                agent.step()
+
+    def _step_sequential(self):
+        model = self.model
+        space = model.space
+        inertia = model.params.inertia
+        profiler = model.profiler
+        for agent in model.schedule.agent_buffer(shuffled=True):
+            row = self._row_of.get(agent.unique_id)
+            if row is None:
+                agent.step()
+                continue
+            if profiler is not None:
+                start = perf_counter()
+            pos = self.position
+            j, dist = space.get_neighbor_rows(pos[row], model.vision, False)
+            if profiler is not None:
+                now = perf_counter()
+                profiler.add("neighbors", now - start)
+                profiler.neighbor_query(len(j))
+            which = np.zeros(len(j), dtype=int)
+            v_new = self.accelerations([row], which, j, pos[j] - pos[row], dist, self.velocity)[0]
+            self.velocity[row] = self.velocity[row] * inertia + v_new
+            agent.velocity = self.velocity[row]
+            if profiler is not None:
+                profiler.add("forces", perf_counter() - now)
+            # move_agent times itself as "move"
+            space.move_agent(agent, self.position[row] + self.velocity[row] * model.speed)
+            if profiler is not None:
+                profiler.add_agent("uninformed", perf_counter() - start)
+
+    def _sync_agents(self, new_pos):
+        # keep the Mesa agents in step with the arrays for the scouts / server
+        # (compact agents are views of the arrays)
+        if self.model.compact:
+            return
+        velocity = self.velocity
+        for boid, row, pos in zip(self.boids, self.boid_rows, new_pos):
+            boid.pos = pos
+            boid.velocity = velocity[row]
@@ -0,0 +1,368 @@
+"""
+Many independent replicates of the swarm stepped together in one set of
+arrays.
+
+    ensemble = Ensemble(200, population=100, seed=1)
+    ensemble.run(5000)
+    ensemble.stop_reason        # one of "arrived", "disconnected", ... per replicate
+    ensemble.results()          # rows like batch.run_trial's
+
+Statistics over hundreds of replicates per parameter point don't need the
+Mesa agents, and R separate BoidFlockers spend most of their time in the
+interpreter.  Ensemble keeps the positions and velocities of R replicates in
+(R,N,2) arrays (N = population + scout_population, uninformed bees first, like
+the rows of the model's space) and advances all of them with numpy.
+
+The replicates are laid out side by side along x in one CellList, each
+shifted past the end of the previous one by more than any neighbor radius, so
+a single neighbor search serves all of them and no pair crosses replicates.
+
+A tick follows the array engine's synchronous update: the uninformed bees
+update from a snapshot taken at the start of the tick, then the scouts apply
+the Scout.step rules (fly toward the goal parallel to the center-goal line,
+reset to the back when in front of the swarm with too few neighbors, leave
+one at a time near the goal) against the same snapshot.  Scouts that left
+stay where they were, like in the model, so the uninformed bees still see
+them.
+
+Every replicate has its own SwarmRandom (rng.py) seeded with seeds[r], so
+results don't depend on R or on which replicates are still running, and
+replicate r uses the same random numbers (starting positions, random walk,
+scout resets) as BoidFlockers(seed=seeds[r]).  The model's scouts step one at
+a time after the uninformed bees moved, but they read the tick-start snapshot
+in model.stats just like the ensemble's scouts read theirs, so replicate r
+follows BoidFlockers(seed=seeds[r], engine="array") up to floating point
+summation order.  That rounding grows over the ticks (around 1e-12 after 50,
+1e-6 after about 100), so long runs drift apart like any two chaotic runs.
+
+A replicate stops and is frozen as soon as it arrives (params.arrival_radius,
+0 turns it off), an uninformed bee gets disconnected, all its scouts left or a
+bee leaves the space (which is an error in the model), checked before every
+step like batch.run_trial does.
+"""
+
+import numpy as np
+
+from .engine import steering
+from .neighbors import CellList
+from .params import SwarmParams
+from .rng import SwarmRandom, run_seed
+from .stats import connected_components
+from .termination import ARRIVED, DISCONNECTED, SCOUTS_GONE, MAX_STEPS, ERROR
+
+
+class Ensemble:
+    """
+    R independent replicates of BoidFlockers.
+
+    Attributes:
+        position, velocity: (R,N,2) arrays.
+        active: (R,N) bool, False for scouts that left near the goal.
+        leave_counter: (R,S) scout leave counters (Scout.leave_counter).
+        running: (R,) bool, replicates still being stepped.
+        steps: (R,) number of steps each replicate took.
+        stop_reason: (R,) stop reason, "" while running.
+        arrived, disconnected, failed: (R,) bool flags behind stop_reason
+            (failed means a bee left the space).
+        center: (R,2) mean position of the main connected component.
+        n_disconnected: (R,) uninformed bees outside the main component.
+    """
+
+    def __init__(
+        self,
+        replicates,
+        population=100,
+        scout_population=10,
+        width=1000,
+        height=400,
+        speed=3,
+        vision=30,
+        separation=15,
+        cohere=0.3,
+        separate=0.3,
+        match=0.3,
+        min_scout_neighbors=10,
+        params=None,
+        seed=None,
+        seeds=None
+    ):
+        """
+        Args:
+            replicates: Number of replicates R.
+            population ... min_scout_neighbors: Same as BoidFlockers, shared
+                by every replicate.
+            params: A SwarmParams for all replicates, or a sequence of R of
+                them to run a different parameter set per replicate.
+            seed: Base seed the per-replicate seeds are derived from
+                (rng.run_seed(seed, 0, r), like batch's runs).
+            seeds: The R per-replicate seeds instead (e.g. the ones of a
+                sweep point to reproduce it).
+        """
+        if params is None:
+            params = SwarmParams()
+        if isinstance(params, SwarmParams):
+            params = [params] * replicates
+        params = list(params)
+        if len(params) != replicates:
+            raise ValueError("need one SwarmParams per replicate, got {} for {}".format(len(params), replicates))
+        self.params = params
+        self.replicates = replicates
+        self.population = population
+        self.scout_population = scout_population
+        self.n_agents = population + scout_population
+        self.width = width
+        self.height = height
+        self.speed = speed
+        self.vision = vision
+        self.separation = separation
+        self.min_scout_neighbors = min_scout_neighbors
+        self.factors = dict(cohere=cohere, separate=separate, match=match)
+
+        if seeds is None:
+            seeds = [run_seed(seed, 0, r) for r in range(replicates)]
+        self.seeds = list(seeds)
+        if len(self.seeds) != replicates:
+            raise ValueError("need one seed per replicate, got {} for {}".format(len(self.seeds), replicates))
+        self.rngs = [SwarmRandom(s, self.n_agents) for s in self.seeds]
+
+        # per replicate parameter arrays
+        self.goal = np.array([p.goal for p in params], dtype=float)
+        for name in ("max_accel", "vmax", "alpha", "weight_random", "inertia", "close_to_goal", "arrival_radius"):
+            setattr(self, "_" + name, np.array([getattr(p, name) for p in params], dtype=float))
+
+        # replicate r is shifted by r * stride along x in the shared CellList
+        self._stride = width + 2 * vision
+        self._offset = np.zeros((replicates, 1, 2))
+        self._offset[:, 0, 0] = np.arange(replicates) * self._stride
+
+        self.make_agents()
+        self.tick = 0
+        self.steps = np.zeros(replicates, dtype=int)
+        self.running = np.ones(replicates, dtype=bool)
+        self.stop_reason = np.full(replicates, "", dtype=object)
+        self.arrived = np.zeros(replicates, dtype=bool)
+        self.disconnected = np.zeros(replicates, dtype=bool)
+        self.failed = np.zeros(replicates, dtype=bool)
+        self.center = np.zeros((replicates, 2))
+        self.n_disconnected = np.zeros(replicates, dtype=int)
+        self.furthest_uninformed_x = np.zeros(replicates)
+        self.min_x = np.zeros(replicates)
+        self.scout_counts = np.zeros((replicates, scout_population), dtype=int)
+        self._index = None
+
+    def make_agents(self):
+        """Starting positions and velocities, the same as BoidFlockers.make_agents."""
+        R, n, s = self.replicates, self.population, self.scout_population
+        self.position = np.empty((R, self.n_agents, 2))
+        self.velocity = np.zeros((R, self.n_agents, 2))
+        for r, (rng, params) in enumerate(zip(self.rngs, self.params)):
+            self.position[r, :n], self.position[r, n:] = rng.start_positions(n, s, params)
+            self.velocity[r, n:, 0] = params.vmax
+        if self._out_of_bounds(self.position).any():
+            raise ValueError("bees start outside of the space, make it bigger or move u_start_center")
+        self.active = np.ones((R, self.n_agents), dtype=bool)
+        self.uninformed = np.zeros(self.n_agents, dtype=bool)
+        self.uninformed[:n] = True
+        self.leave_counter = np.tile(np.arange(s), (R, 1))
+
+    def _out_of_bounds(self, points):
+        """Per replicate: does any of the (R',k,2) points lie outside the space."""
+        x = points[..., 0]
+        y = points[..., 1]
+        return ((x < 0) | (x >= self.width) | (y < 0) | (y >= self.height)).any(axis=-1)
+
+    def _per_bee(self, values, replicate):
+        # one value per bee, or just a scalar when every replicate has the same
+        if (values == values[0]).all():
+            return values[0]
+        return values[replicate]
+
+    def update_stats(self):
+        """
+        Take the snapshot of the running replicates: the cell list and the
+        swarm stats the scouts read (see stats.SwarmStats).
+        """
+        R, N, n = self.replicates, self.n_agents, self.population
+        flat = (self.position + self._offset).reshape(-1, 2)
+        self._index = CellList(flat, self.vision)
+        active = self.active & self.running[:, None]
+        active_flat = active.ravel()
+        rows = np.nonzero(active_flat)[0]
+
+        which, j, delta, dist = self._index.pairs(rows, self.vision)
+        # the uninformed bees' forces reuse these pairs
+        self._pairs = (rows, which, j, delta, dist)
+        keep = active_flat[j]
+        labels = connected_components(R * N, rows[which[keep]], j[keep])
+        sizes = np.bincount(labels[rows], minlength=R * N).reshape(R, N)
+        # labels are the smallest row of the component, so they stay inside
+        # their replicate's block of rows
+        local = labels.reshape(R, N) - (np.arange(R) * N)[:, None]
+        main = sizes.argmax(axis=1)
+        in_main = active & (local == main[:, None])
+        size = np.maximum(in_main.sum(axis=1), 1)
+        center = (self.position * in_main[..., None]).sum(axis=1) / size[:, None]
+        n_disconnected = np.count_nonzero(active & self.uninformed & ~in_main, axis=1)
+        x = self.position[..., 0]
+        furthest = np.where(active & self.uninformed, x, -np.inf).max(axis=1)
+        min_x = np.where(active, x, np.inf).min(axis=1)
+
+        scouts = active[:, n:]
+        scout_rows = (np.arange(R)[:, None] * N + n + np.arange(self.scout_population))[scouts]
+        which, j, _, _ = self._index.pairs(scout_rows, self.vision * 1.5)
+        counts = np.zeros((R, self.scout_population), dtype=int)
+        counts[scouts] = np.bincount(which[active_flat[j]], minlength=len(scout_rows))
+
+        running = self.running
+        self.center[running] = center[running]
+        self.n_disconnected[running] = n_disconnected[running]
+        self.furthest_uninformed_x[running] = furthest[running]
+        self.min_x[running] = min_x[running]
+        self.scout_counts[running] = counts[running]
+
+    def _stop(self, replicates, reason):
+        replicates = replicates & self.running
+        self.stop_reason[replicates] = reason
+        self.running[replicates] = False
+
+    def check(self):
+        """
+        Stop the replicates that arrived (within arrival_radius, inside the
+        close_to_goal where the scouts leave), got disconnected or lost all
+        their scouts at the snapshot, in Termination's order.
+        """
+        distance = np.linalg.norm(self.goal - self.center, axis=1)
+        arrived = self.running & (distance < self._arrival_radius)
+        self.arrived |= arrived
+        self._stop(arrived, ARRIVED)
+        disconnected = self.running & (self.n_disconnected > 0)
+        self.disconnected |= disconnected
+        self._stop(disconnected, DISCONNECTED)
+        if self.scout_population:
+            self._stop(~self.active[:, self.population:].any(axis=1), SCOUTS_GONE)
+
+    def _fail(self, replicates):
+        self.failed[replicates] = True
+        self.running[replicates] = False
+        self.stop_reason[replicates] = ERROR
+
+    def step(self):
+        """Snapshot, stop finished replicates and advance the rest one tick."""
+        self.update_stats()
+        self.check()
+        if not self.running.any():
+            return
+        self._step_uninformed()
+        self._step_scouts()
+        self.steps[self.running] += 1
+        self.tick += 1
+
+    def _step_uninformed(self):
+        N, n = self.n_agents, self.population
+        reps = np.nonzero(self.running)[0]
+        # the snapshot's pairs of the uninformed bees of replicates still
+        # running (uninformed bees are always active, so they are all there)
+        rows, which, j, delta, dist = self._pairs
+        selected = self.uninformed[rows % N] & self.running[rows // N]
+        renumber = np.cumsum(selected) - 1
+        keep = selected[which]
+        which, j, delta, dist = renumber[which[keep]], j[keep], delta[keep], dist[keep]
+        rows = rows[selected]
+        replicate = rows // N
+        k = len(rows)
+        random = None
+        if self._weight_random.any():
+            random = np.zeros((k, 2))
+            bees = np.arange(n)
+            for i, r in enumerate(reps):
+                if self._weight_random[r]:
+                    random[i * n:(i + 1) * n] = self.rngs[r].random_walk(self.tick, bees) * self._weight_random[r]
+        velocity = self.velocity.reshape(-1, 2)
+        v_new = steering(
+            k, which, j, delta, dist, velocity, self.vision, self.separation, self.factors,
+            self._per_bee(self._alpha, replicate),
+            self._per_bee(self._vmax, replicate),
+            self._per_bee(self._max_accel, replicate),
+            # The paper does not do the align behavior for the first few steps
+            align=self.tick > 4,
+            random=random
+        )
+        inertia = self._inertia[reps][:, None, None]
+        new_velocity = self.velocity[reps, :n] * inertia + v_new.reshape(len(reps), n, 2)
+        new_position = self.position[reps, :n] + new_velocity * self.speed
+        bad = self._out_of_bounds(new_position)
+        self._fail(reps[bad])
+        ok = reps[~bad]
+        self.velocity[ok, :n] = new_velocity[~bad]
+        self.position[ok, :n] = new_position[~bad]
+
+    def _step_scouts(self):
+        n = self.population
+        reps = np.nonzero(self.running)[0]
+        active = self.active[reps, n:]
+        pos = self.position[reps, n:]
+        counter = self.leave_counter[reps]
+        center = self.center[reps]
+
+        # distance from goal where scouts disappear, measured from swarm center
+        to_goal = self.goal[reps] - center
+        distance = np.linalg.norm(to_goal, axis=1)
+        near = (distance < self._close_to_goal[reps])[:, None]
+        leaving = near & active
+        gone = leaving & (counter == 0)
+        counter[leaving & (counter > 0)] -= 1
+        # in front of the swarm with too few neighbors: go back
+        reset = (~near & active & (self.scout_counts[reps] <= self.min_scout_neighbors)
+                 & (pos[..., 0] > self.furthest_uninformed_x[reps][:, None]))
+        fly = ~near & active & ~reset
+
+        new_pos = pos.copy()
+        if reset.any():
+            jitter = np.zeros(reset.shape)
+            for i in np.nonzero(reset.any(axis=1))[0]:
+                jitter[i, reset[i]] = self.rngs[reps[i]].uniform(self.tick, n + np.nonzero(reset[i])[0]) * 2
+            min_x = self.min_x[reps][:, None] + jitter
+            goal = self.goal[reps]
+            m = ((center[:, 1] - goal[:, 1]) / (center[:, 0] - goal[:, 0]))[:, None]
+            b = pos[..., 1] - m * pos[..., 0]
+            new_pos[reset, 0] = min_x[reset]
+            new_pos[reset, 1] = (m * min_x + b)[reset]
+        step = (self.speed * self._vmax[reps] / distance)[:, None] * to_goal
+        new_pos[fly] += np.broadcast_to(step[:, None, :], pos.shape)[fly]
+
+        bad = self._out_of_bounds(new_pos)
+        self._fail(reps[bad])
+        ok = ~bad
+        self.position[reps[ok], n:] = new_pos[ok]
+        self.leave_counter[reps[ok]] = counter[ok]
+        active[gone] = False
+        self.active[reps[ok], n:] = active[ok]
+
+    def run(self, max_steps=5000):
+        """
+        Step until every replicate stopped or max_steps ticks.  Replicates
+        still running at the end are stopped with reason "max_steps".
+        """
+        while self.running.any() and self.tick < max_steps:
+            self.step()
+        self.update_stats()
+        self.check()
+        self._stop(self.running.copy(), MAX_STEPS)
+
+    def results(self):
+        """One summary dict per replicate, with the fields of batch.run_trial."""
+        distance = np.linalg.norm(self.goal - self.center, axis=1)
+        scouts_left = self.active[:, self.population:].sum(axis=1)
+        return [
+            {
+                "replicate": r,
+                "stop_reason": self.stop_reason[r],
+                "steps": int(self.steps[r]),
+                "center_x": self.center[r, 0],
+                "center_y": self.center[r, 1],
+                "distance_to_goal": distance[r],
+                "n_disconnected": int(self.n_disconnected[r]),
+                "scouts_left": int(scouts_left[r]),
+            }
+            for r in range(self.replicates)
+        ]
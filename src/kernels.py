@@ -0,0 +1,137 @@
+"""
+Compiled version of the uninformed bees' steering forces.
+
+engine.steering works on the (which, j, delta, dist) pair arrays from
+CellList.pairs, so every tick it allocates a few arrays with one entry per
+neighbor pair and runs several bincounts over them.  steer_cells walks the
+cell list directly instead: every bee scans the cells around it and adds up
+cohere / avoid / align on the fly, so there are no pair arrays at all.  With
+numba installed it is compiled and runs over the bees in parallel:
+
+    model = BoidFlockers(engine="array", backend="numba")
+
+numba is optional.  Without it HAVE_NUMBA is False and the engine falls back
+to the pure numpy steering (the loops below still run as plain Python, which
+is far too slow for anything but checking them).  numba itself takes a few
+hundred ms to import, so it is only imported (and the kernel compiled) the
+first time steer_cells is called; headless workers on the numpy backend never
+load it.
+
+The sums are taken in the same order as CellList.pairs produces the pairs,
+so the two backends agree to floating point rounding.
+"""
+
+import importlib.util
+import math
+
+import numpy as np
+
+HAVE_NUMBA = importlib.util.find_spec("numba") is not None
+
+# numba.prange once compiled, the plain loop runs over range
+prange = range
+_compiled = False
+
+
+def _steer_cells(points, vel, cells, shape, order, start, rows, reach, vision, separation,
+                 cohere_factor, separate_factor, match_factor, alpha, vmax, max_accel, align,
+                 random, out, found):
+    for b in prange(len(rows)):
+        i = rows[b]
+        px = points[i, 0]
+        py = points[i, 1]
+        n = 0
+        n_close = 0
+        cohere_x = cohere_y = 0.0
+        separate_x = separate_y = 0.0
+        match_x = match_y = 0.0
+        for dx in range(-reach, reach + 1):
+            cx = cells[i, 0] + dx
+            if cx < 0 or cx >= shape[0]:
+                continue
+            for dy in range(-reach, reach + 1):
+                cy = cells[i, 1] + dy
+                if cy < 0 or cy >= shape[1]:
+                    continue
+                key = cx * shape[1] + cy
+                for slot in range(start[key], start[key + 1]):
+                    j = order[slot]
+                    delta_x = points[j, 0] - px
+                    delta_y = points[j, 1] - py
+                    dist = math.sqrt(delta_x ** 2 + delta_y ** 2)
+                    if dist > vision or dist == 0:
+                        continue
+                    n += 1
+                    cohere_x += delta_x
+                    cohere_y += delta_y
+                    match_x += vel[j, 0]
+                    match_y += vel[j, 1]
+                    if dist < separation:
+                        n_close += 1
+                        weight = separation / dist - 1
+                        separate_x += weight * delta_x
+                        separate_y += weight * delta_y
+        found[b] = n
+        count = max(n, 1)
+        v_x = cohere_x / count / vision * cohere_factor
+        v_y = cohere_y / count / vision * cohere_factor
+        if n_close > 0:
+            separate_x = -separate_x / n_close / separation
+            separate_y = -separate_y / n_close / separation
+            scale = math.sqrt(separate_x ** 2 + separate_y ** 2) ** alpha
+            v_x += separate_x / scale * separate_factor
+            v_y += separate_y / scale * separate_factor
+        if align:
+            v_x += match_x / count / vmax * match_factor
+            v_y += match_y / count / vmax * match_factor
+        v_x += random[b, 0]
+        v_y += random[b, 1]
+        norm = math.sqrt(v_x ** 2 + v_y ** 2)
+        if norm > max_accel:
+            v_x *= max_accel / norm
+            v_y *= max_accel / norm
+        out[b, 0] = v_x
+        out[b, 1] = v_y
+
+
+def _compile():
+    global _steer_cells, prange, _compiled
+    if not _compiled and HAVE_NUMBA:
+        from numba import njit, prange
+        _steer_cells = njit(parallel=True, cache=True)(_steer_cells)
+    _compiled = True
+
+
+def steer_cells(index, rows, vel, vision, separation, factors, alpha, vmax, max_accel, align, random):
+    """
+    Same result as engine.steering over index.pairs(rows, vision), computed
+    straight from the cell list.
+
+    Args:
+        index: CellList of the tick's snapshot.
+        rows: Rows of the bees to steer.
+        vel: (M,2) velocities of all points.
+        vision, separation, factors: The model's boid settings.
+        alpha, vmax, max_accel: SwarmParams values (scalars).
+        align: Include the align term.
+        random: (k,2) weighted random terms.
+
+    Returns:
+        (v_new, found): the (k,2) steering vectors and the total number of
+        neighbors found.
+    """
+    _compile()
+    rows = np.ascontiguousarray(rows, dtype=np.int64)
+    k = len(rows)
+    out = np.empty((k, 2))
+    found = np.empty(k, dtype=np.int64)
+    reach = max(1, math.ceil(vision / index.cell_size))
+    _steer_cells(
+        np.ascontiguousarray(index.points, dtype=float), np.ascontiguousarray(vel, dtype=float),
+        index.cells, index.shape, index.order, index.start, rows, reach,
+        float(vision), float(separation),
+        float(factors['cohere']), float(factors['separate']), float(factors['match']),
+        float(alpha), float(vmax), float(max_accel), bool(align),
+        np.ascontiguousarray(random, dtype=float), out, found
+    )
+    return out, int(found.sum())
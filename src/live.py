@@ -0,0 +1,273 @@
+"""
+Live server where the simulation doesn't wait for the browser.
+
+With ModularServer every "get_step" from the browser steps the model and
+renders it before the answer goes out, so a slow render stalls the model, a
+slow tick stalls the page and every extra viewer steps the model again.
+LiveServer runs the model in its own thread at its own pace instead:
+
+    python run.py --live --tps 30 --fps 15
+
+    Simulation thread   steps the model (as fast as it can, or tps ticks per
+                        second) and renders at most fps frames per second.
+                        Each frame is rendered and JSON encoded once and put
+                        into a FrameBuffer.
+    FrameBuffer         holds only the latest frame and its sequence number,
+                        publishing a new one drops the old one, so memory
+                        stays bounded however slow the viewers are.
+    LiveSocketHandler   answers a viewer's "get_step" with whatever frame is
+                        current (waiting briefly for a new one if the viewer
+                        already has it).  Viewers never make the model do any
+                        work, any number of them can watch the same run.
+
+The server sets the page's frames-per-second slider to 0 so a viewer asks
+for the next frame as soon as it drew one, the simulation's fps sets the
+frame rate instead (and isn't capped at the slider's 20).
+
+A viewer's "reset" (the page sends one when it connects) only resyncs that
+viewer to the live run, unless the run has ended, in which case it starts a
+new run for everyone with the current parameters.  With restart_on_reset
+every reset starts a new run (replay.py uses that to scrub).
+"""
+
+import asyncio
+import json
+import threading
+import traceback
+from time import perf_counter, sleep
+
+import tornado.escape
+import tornado.ioloop
+import tornado.websocket
+from mesa.visualization.ModularVisualization import ModularServer
+from mesa.visualization.UserParam import UserSettableParameter
+
+# how long a viewer that is up to date waits for a new frame before getting
+# the same one again (the page asks again right away after it drew a frame)
+FRAME_WAIT = 1.0
+
+# run after runcontrol.js: don't wait between frames, the server paces them
+UNPACED_PAGE_JS = "controller.updateFPS(0); fpsControl.slider('setValue', 0);"
+
+
+class FrameBuffer:
+    """
+    The latest frame of a run, thread safe.
+
+    Attributes:
+        seq: Sequence number of the frame, goes up by one per publish.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.seq = 0
+        self._frame = None
+        self._final = False
+
+    def publish(self, frame, final=False):
+        """Replace the frame (an encoded message).  final marks the last frame of a run."""
+        with self._lock:
+            self.seq += 1
+            self._frame = frame
+            self._final = final
+
+    def latest(self):
+        """Return (seq, frame, final) of the current frame."""
+        with self._lock:
+            return self.seq, self._frame, self._final
+
+
+class Simulation(threading.Thread):
+    """
+    Steps a model in a background thread and publishes rendered frames.
+
+    Attributes:
+        model: The model being run.  Only this thread touches it.
+        ticks_per_second: Measured stepping rate of the current run.
+    """
+
+    def __init__(self, make_model, render, buffer, tps=None, fps=20, on_frame=None):
+        """
+        Args:
+            make_model: Callable building a new model.
+            render: Callable turning the model into the "viz_state" data.
+            buffer: FrameBuffer to publish to.
+            tps: Ticks per second to run at, None for as fast as possible.
+            fps: Frames per second to render at most, None to render
+                every tick.
+            on_frame: Called (from this thread) after every publish.
+        """
+        super().__init__(daemon=True)
+        self.make_model = make_model
+        self.render = render
+        self.buffer = buffer
+        self.tps = tps
+        self.fps = fps
+        self.on_frame = on_frame
+        self.model = None
+        self.ticks_per_second = 0.0
+        self._wake = threading.Event()
+        self._reset = True
+        self._stopping = False
+
+    def reset(self):
+        """Start a new run (from any thread)."""
+        self._reset = True
+        self._wake.set()
+
+    def stop(self):
+        self._stopping = True
+        self._wake.set()
+
+    @property
+    def finished(self):
+        model = self.model
+        return model is not None and not model.running and not self._reset
+
+    def _publish(self, final=False):
+        message = {"type": "viz_state", "data": self.render(self.model)}
+        self.buffer.publish(json.dumps(message), final)
+        if self.on_frame is not None:
+            self.on_frame()
+
+    def run(self):
+        while not self._stopping:
+            if self._reset:
+                self._reset = False
+                self.model = self.make_model()
+                start, ticks = perf_counter(), 0
+                last_frame = perf_counter()
+                self._publish(not self.model.running)
+            model = self.model
+            if not model.running:
+                # wait for a reset
+                self._wake.wait()
+                self._wake.clear()
+                continue
+            tick_start = perf_counter()
+            try:
+                model.step()
+            except Exception:
+                # e.g. a bee left the (non-toroidal) space, show where it ended
+                traceback.print_exc()
+                model.running = False
+            ticks += 1
+            now = perf_counter()
+            self.ticks_per_second = ticks / (now - start)
+            if not model.running:
+                self._publish(final=True)
+            elif self.fps is None or now - last_frame >= 1 / self.fps:
+                last_frame = now
+                self._publish()
+            if self.tps:
+                sleep(max(0.0, 1 / self.tps - (perf_counter() - tick_start)))
+
+
+class LiveSocketHandler(tornado.websocket.WebSocketHandler):
+    """Serves a viewer the simulation's current frames."""
+
+    def open(self):
+        self.last_seq = None
+        self.write_message({"type": "model_params", "params": self.application.user_params})
+
+    def check_origin(self, origin):
+        return True
+
+    async def on_message(self, message):
+        app = self.application
+        msg = tornado.escape.json_decode(message)
+        if msg["type"] == "get_step":
+            seq, frame, final = app.buffer.latest()
+            if seq == self.last_seq:
+                if final:
+                    self.write_message({"type": "end"})
+                    return
+                try:
+                    await asyncio.wait_for(app.new_frame.wait(), FRAME_WAIT)
+                except asyncio.TimeoutError:
+                    pass
+                seq, frame, final = app.buffer.latest()
+            self.send_frame(seq, frame)
+        elif msg["type"] == "reset":
+            if app.simulation.finished or app.restart_on_reset:
+                new_frame = app.new_frame
+                app.simulation.reset()
+                try:
+                    await asyncio.wait_for(new_frame.wait(), FRAME_WAIT)
+                except asyncio.TimeoutError:
+                    pass
+            self.send_frame(*app.buffer.latest()[:2])
+        elif msg["type"] == "submit_params":
+            # takes effect with the next run, like ModularServer
+            param = msg["param"]
+            if param in app.user_params:
+                if isinstance(app.model_kwargs[param], UserSettableParameter):
+                    app.model_kwargs[param].value = msg["value"]
+                else:
+                    app.model_kwargs[param] = msg["value"]
+
+    def send_frame(self, seq, frame):
+        if frame is not None:
+            self.last_seq = seq
+            try:
+                self.write_message(frame)
+            except tornado.websocket.WebSocketClosedError:
+                # the viewer left while waiting for the frame
+                pass
+
+
+class LiveServer(ModularServer):
+    """
+    ModularServer whose model runs in a Simulation thread, see the module
+    docstring.  Takes the same arguments plus tps, fps and restart_on_reset
+    (start a new run on every viewer's reset, not only once the run ended).
+
+    Attributes:
+        simulation: The Simulation thread.
+        buffer: Its FrameBuffer.
+    """
+
+    socket_handler = (r"/ws", LiveSocketHandler)
+    handlers = [ModularServer.page_handler, socket_handler, ModularServer.static_handler, ModularServer.local_handler]
+
+    def __init__(self, model_cls, visualization_elements, name="Mesa Model", model_params={}, tps=None, fps=20,
+                 restart_on_reset=False):
+        self.restart_on_reset = restart_on_reset
+        self.buffer = FrameBuffer()
+        self.new_frame = asyncio.Event()
+        self._loop = None
+        self.simulation = Simulation(
+            self._make_model, self.render_model, self.buffer, tps, fps, self._frame_published
+        )
+        super().__init__(model_cls, visualization_elements, name, model_params)
+        self.js_code.append(UNPACED_PAGE_JS)
+
+    def _make_model(self):
+        # ModularServer.reset_model builds self.model from the current params
+        ModularServer.reset_model(self)
+        return self.model
+
+    def reset_model(self):
+        """Start a new run (called once by ModularServer.__init__)."""
+        if not self.simulation.is_alive():
+            self.simulation.start()
+        else:
+            self.simulation.reset()
+
+    def _frame_published(self):
+        # simulation thread -> IO loop, wake the viewers waiting for a frame
+        if self._loop is not None:
+            self._loop.add_callback(self._wake_viewers)
+
+    def _wake_viewers(self):
+        event, self.new_frame = self.new_frame, asyncio.Event()
+        event.set()
+
+    def render_model(self, model=None):
+        """Render model (the simulation's by default).  Only call from the simulation thread."""
+        model = model if model is not None else self.simulation.model
+        return [element.render(model) for element in self.visualization_elements]
+
+    def launch(self, port=None, open_browser=True):
+        self._loop = tornado.ioloop.IOLoop.current()
+        super().launch(port, open_browser)
@@ -0,0 +1,261 @@
+"""
+Swarm metrics computed while the model runs, in constant memory.
+
+    model = BoidFlockers(metrics=True)
+    for _ in range(500):
+        model.step()
+    model.metrics.summary()            # {"speed_to_goal_mean": ..., "spread_std": ...}
+    model.metrics.series("spread")     # (ticks, values), decimated
+
+After every step SwarmMetrics takes a few vectorized reductions over the
+current positions and velocities:
+
+    speed_to_goal   mean velocity of the uninformed bees along the direction
+                    from the swarm center to the goal
+    spread          root mean square distance of the uninformed bees from the
+                    swarm center
+    scout_front     fraction of the scouts still flying that are at the front
+                    of the swarm (no more than front_depth behind the
+                    uninformed bee furthest toward the goal)
+    path_deviation  distance of the swarm center from the straight line
+                    between where the center started and the goal
+
+Every metric keeps a RunningStats (Welford mean / variance, min, max) over
+the whole run and a DecimatedSeries of at most capacity samples, so a long
+run or a big sweep doesn't need to record trajectories to get them.  The
+swarm center is the one from model.stats (main connected component), which
+the model computes once per tick anyway.
+"""
+
+import math
+
+import numpy as np
+
+METRICS = ("speed_to_goal", "spread", "scout_front", "path_deviation")
+
+
+class RunningStats:
+    """
+    Mean, variance, min and max of a stream of numbers (Welford's algorithm),
+    without keeping the numbers.
+    """
+
+    def __init__(self):
+        self.count = 0
+        self.mean = 0.0
+        self._m2 = 0.0
+        self.min = math.inf
+        self.max = -math.inf
+
+    def add(self, value):
+        value = float(value)
+        self.count += 1
+        delta = value - self.mean
+        self.mean += delta / self.count
+        self._m2 += delta * (value - self.mean)
+        self.min = min(self.min, value)
+        self.max = max(self.max, value)
+
+    def merge(self, other):
+        """Add everything other has seen (Chan et al.'s parallel update)."""
+        if other.count == 0:
+            return
+        count = self.count + other.count
+        delta = other.mean - self.mean
+        self._m2 += other._m2 + delta ** 2 * self.count * other.count / count
+        self.mean += delta * other.count / count
+        self.count = count
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+
+    def state(self):
+        """[count, mean, M2, min, max], see from_state."""
+        return [self.count, self.mean, self._m2, self.min, self.max]
+
+    @classmethod
+    def from_state(cls, state):
+        stats = cls()
+        stats.count, stats.mean, stats._m2, stats.min, stats.max = state
+        return stats
+
+    @property
+    def variance(self):
+        """Sample variance (nan for fewer than two values)."""
+        return self._m2 / (self.count - 1) if self.count > 1 else math.nan
+
+    @property
+    def std(self):
+        return math.sqrt(self.variance)
+
+
+class DecimatedSeries:
+    """
+    Time series of at most capacity (tick, value) samples.  It keeps every
+    stride-th tick, and when it fills up it drops every other sample and
+    doubles the stride, so it always spans the whole run.
+    """
+
+    def __init__(self, capacity=256):
+        self.capacity = max(2, capacity - capacity % 2)
+        self.stride = 1
+        self._ticks = np.empty(self.capacity, dtype=np.int64)
+        self._values = np.empty(self.capacity)
+        self._n = 0
+
+    def add(self, tick, value):
+        if tick % self.stride:
+            return
+        if self._n == self.capacity:
+            half = self.capacity // 2
+            self._ticks[:half] = self._ticks[::2]
+            self._values[:half] = self._values[::2]
+            self._n = half
+            self.stride *= 2
+            if tick % self.stride:
+                return
+        self._ticks[self._n] = tick
+        self._values[self._n] = value
+        self._n += 1
+
+    def state(self):
+        """JSON-able dict of the samples and stride, see from_state."""
+        return {"capacity": self.capacity, "stride": self.stride,
+                "ticks": self.ticks.tolist(), "values": self.values.tolist()}
+
+    @classmethod
+    def from_state(cls, state):
+        series = cls(state["capacity"])
+        series.stride = state["stride"]
+        series._n = len(state["ticks"])
+        series._ticks[:series._n] = state["ticks"]
+        series._values[:series._n] = state["values"]
+        return series
+
+    @property
+    def ticks(self):
+        return self._ticks[:self._n]
+
+    @property
+    def values(self):
+        return self._values[:self._n]
+
+
+class SwarmMetrics:
+    """
+    Streaming metrics of a BoidFlockers run, see the module docstring.
+
+    Attributes:
+        stats: dict of metric name -> RunningStats.
+        last: dict of metric name -> value at the last update.
+        start: Swarm center at the first update (for path_deviation).
+    """
+
+    def __init__(self, every=1, capacity=256, front_depth=None):
+        """
+        Args:
+            every: Only update every this many steps.
+            capacity: Samples kept per metric series.
+            front_depth: How far behind the front a scout still counts as
+                at the front.  Defaults to the model's vision.
+        """
+        self.every = max(1, every)
+        self.front_depth = front_depth
+        self.stats = {name: RunningStats() for name in METRICS}
+        self._series = {name: DecimatedSeries(capacity) for name in METRICS}
+        self.last = {}
+        self.start = None
+
+    def measure(self, model):
+        """Return the metrics of the model's current state (a dict)."""
+        points = model.space._agent_points
+        active = model.active
+        uninformed = active & model.uninformed
+        scouts = active & ~model.uninformed
+        center = model.stats.center
+        if self.start is None:
+            self.start = center.copy()
+
+        to_goal = model.goal - center
+        distance = np.linalg.norm(to_goal)
+        heading = to_goal / distance if distance > 0 else np.zeros(2)
+        velocity = model.get_velocities()[uninformed]
+        offset = points[uninformed] - center
+
+        # how far along the center -> goal direction every bee is
+        along = (points - center) @ heading
+        front = along[uninformed].max(initial=-np.inf)
+        depth = model.vision if self.front_depth is None else self.front_depth
+        n_scouts = np.count_nonzero(scouts)
+        at_front = np.count_nonzero(along[scouts] >= front - depth)
+
+        # distance of the center from the start -> goal line
+        line = model.goal - self.start
+        length = np.linalg.norm(line)
+        relative = center - self.start
+        if length > 0:
+            deviation = abs(line[0] * relative[1] - line[1] * relative[0]) / length
+        else:
+            deviation = np.linalg.norm(relative)
+
+        return {
+            "speed_to_goal": float((velocity @ heading).mean()) if len(velocity) else 0.0,
+            "spread": float(np.sqrt((offset ** 2).sum(axis=1).mean())) if len(offset) else 0.0,
+            "scout_front": float(at_front / n_scouts) if n_scouts else 0.0,
+            "path_deviation": float(deviation),
+        }
+
+    def update(self, model):
+        """Measure the model (called by BoidFlockers.step after every step)."""
+        tick = model.schedule.steps
+        if tick % self.every:
+            return
+        self.last = self.measure(model)
+        for name, value in self.last.items():
+            self.stats[name].add(value)
+            self._series[name].add(tick, value)
+
+    def state(self):
+        """
+        Everything the metrics accumulated as a JSON-able dict (checkpoints
+        save it), see from_state.
+        """
+        return {
+            "every": self.every,
+            "front_depth": self.front_depth,
+            "start": None if self.start is None else self.start.tolist(),
+            "last": self.last,
+            "stats": {name: stats.state() for name, stats in self.stats.items()},
+            "series": {name: series.state() for name, series in self._series.items()},
+        }
+
+    @classmethod
+    def from_state(cls, state):
+        """A SwarmMetrics that continues where the one state came from left off."""
+        metrics = cls(state["every"], front_depth=state["front_depth"])
+        if state["start"] is not None:
+            metrics.start = np.array(state["start"])
+        metrics.last = dict(state["last"])
+        metrics.stats = {name: RunningStats.from_state(s) for name, s in state["stats"].items()}
+        metrics._series = {name: DecimatedSeries.from_state(s) for name, s in state["series"].items()}
+        return metrics
+
+    def series(self, name):
+        """(ticks, values) arrays of the decimated series of a metric."""
+        series = self._series[name]
+        return series.ticks.copy(), series.values.copy()
+
+    def summary(self):
+        """Flat dict of the mean, std, min, max and last value of every metric."""
+        summary = {}
+        for name in METRICS:
+            stats = self.stats[name]
+            summary[name + "_mean"] = stats.mean if stats.count else math.nan
+            summary[name + "_std"] = stats.std
+            summary[name + "_min"] = stats.min if stats.count else math.nan
+            summary[name + "_max"] = stats.max if stats.count else math.nan
+            summary[name + "_last"] = self.last.get(name, math.nan)
+        return summary
+
+
+# column names of SwarmMetrics.summary, for CSV headers
+SUMMARY_FIELDS = [name + suffix for name in METRICS for suffix in ("_mean", "_std", "_min", "_max", "_last")]
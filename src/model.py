@@ -8,22 +8,32 @@ A Mesa implementation of Craig Reynolds's Boids flocker model.
 Uses numpy arrays to represent vectors.
 """
 
+import random
+
 import numpy as np
 
 from mesa import Model
-from mesa.space import ContinuousSpace
 from mesa.time import RandomActivation
 
 from .boid import Boid
 from .scout import Scout
+from .compact import CompactBoid, CompactScout
+from .engine import ArrayEngine, SYNCHRONOUS, NUMPY
+from .neighbors import GridSpace
+from .stats import SwarmStats
+from .profiling import TickProfiler
+from .params import SwarmParams
+from .metrics import SwarmMetrics
+from .termination import Termination
+from .rng import SwarmRandom
 
-# This is bad practice and should be parameters but it'll have to do
-GOAL_X = 900 # in paper this will go out to 4000, but I'm doing some smaller runs first
-GOAL_Y = 150 # in paper I think this is 200 -- This will probably eventually be some fraction of n/2 (maybe n/4?)
-SCOUT_START_X = 75 # scout start area is from (0, SCOUT_START_X) scouts will be evenly spaced + noise
-U_START_CENTER = np.array([150,150]) # in paper this is [200,200,200] and uninformed bees are placed in a cube with side lengths n/3
-# n/3 is to prevent bees from starting starting disconnected.  I will do n/2 here instead.  I think n/3 has a lot to do with the
-# dimension choice here.
+# GOAL_X, GOAL_Y, SCOUT_START_X and U_START_CENTER used to be module globals
+# here.  They are in params.SwarmParams now, along with the constants from
+# boid.py, so different models can use different values.
+# In the paper uninformed bees are placed in a cube with side lengths n/3
+# around the start center.  n/3 is to prevent bees from starting starting
+# disconnected.  I will do n/2 here instead.  I think n/3 has a lot to do with
+# the dimension choice here.
 
 # weights for cohere, avoid, align, random and max_accel
 # are all set to 0.3 (this is what they are set to in the paper)
@@ -51,9 +61,19 @@ class BoidFlockers(Model):
         cohere=0.3,
         separate=0.3,
         match=0.3,
-        goal=np.array([900,150]),
-        vmax=1.55,
-        min_scout_neighbors=10
+        goal=None,
+        vmax=None,
+        min_scout_neighbors=10,
+        engine="agent",
+        update=SYNCHRONOUS,
+        backend=NUMPY,
+        seed=None,
+        profile=False,
+        termination=None,
+        params=None,
+        compact=False,
+        metrics=None,
+        space_cls=GridSpace
     ):
         """
         Create a new Flockers model.
@@ -66,56 +86,142 @@ class BoidFlockers(Model):
                     keep from any other
             cohere, separate, match: factors for the relative importance of
                     the three drives.
+            goal: (x, y) of the goal.  Overrides params.goal_x/goal_y.
+            vmax: Maximum speed.  Overrides params.vmax.
+            engine: "agent" steps every agent through its own step method
+                    (RandomActivation).  "array" steps the uninformed bees in
+                    batches with numpy (see engine.py), which is much faster for
+                    big swarms.
+            update: Update semantics for the "array" engine, either
+                    "synchronous" or "sequential".  See engine.py for the
+                    difference.  Ignored by the "agent" engine.
+            backend: How the "array" engine computes the forces: "numpy" or
+                    "numba" (compiled, needs numba installed; see
+                    kernels.py).  Ignored by the "agent" engine.
+            seed: Seed of the model's random streams: self.rng (see rng.py,
+                    starting positions, random walk, scout resets) and
+                    self.random (the scheduler's shuffle).  The global
+                    np.random is not used.
+            profile: True (or a profiling.TickProfiler) to record per tick
+                    timings in self.profiler.  Off by default.
+            termination: A termination.Termination (True for the default
+                    conditions) that stops the model (running = False) when
+                    the swarm arrives, disconnects etc.  The reason is kept
+                    in self.stop_reason.  Off by default.
+            params: params.SwarmParams with the remaining simulation
+                    constants (acceleration clamp, inertia, start positions,
+                    when scouts leave...).  Defaults to SwarmParams().
+            compact: Use compact.CompactBoid / CompactScout, slot-only
+                    agents whose pos and velocity are views into the
+                    space's points and self.velocity.  They aren't Boid /
+                    Scout instances, self.uninformed says which is which.  Saves memory and
+                    per-tick copies for very large swarms.
+            metrics: A metrics.SwarmMetrics (True for the defaults) that
+                    keeps running statistics of the swarm's speed toward
+                    the goal, spread etc. in self.metrics, updated after
+                    every step.  Off by default.
+            space_cls: Class of the space, a neighbors.GridSpace or a
+                    subclass (called as space_cls(width, height, False,
+                    cell_size=vision)).  The swarm stats and the array engine
+                    need GridSpace's version counter and cell list.
         """
+        # Mesa's Model.__new__ puts the RNG on the class, so every new model
+        # would replace the RNG of the ones before it.  Give each its own.
+        self._seed = seed
+        self.random = random.Random(seed)
+        # per-tick, per-row draws that don't depend on the stepping order
+        self.rng = SwarmRandom(seed, population + scout_population)
+        if params is None:
+            params = SwarmParams()
+        if goal is not None:
+            params = params.replace(goal_x=float(goal[0]), goal_y=float(goal[1]))
+        if vmax is not None:
+            params = params.replace(vmax=vmax)
+        # immutable, so agents and the engine can hold on to it
+        self.params = params
         self.population = population
         self.scout_population=scout_population
-        self.goal = goal
+        self.goal = np.array(params.goal)
         self.vision = vision
         self.speed = speed
         self.separation = separation
-        self.vmax = vmax
+        self.vmax = params.vmax
         self.min_scout_neighbors = min_scout_neighbors
         self.schedule = RandomActivation(self)
-        self.space = ContinuousSpace(width, height, False)
+        # grid cells the size of vision so neighbor lookups only scan nearby bees
+        self.space = space_cls(width, height, False, cell_size=vision)
+        if profile is True:
+            profile = TickProfiler()
+        self.profiler = profile or None
+        self.space.profiler = self.profiler
         self.factors = dict(cohere=cohere, separate=separate, match=match)
+        self.compact = compact
+        # (N,2) velocities of the compact agents, indexed like the space's
+        # _agent_points.  Regular agents keep their own.
+        self.velocity = None
+        if compact:
+            self.velocity = np.zeros((population + scout_population, 2))
         self.make_agents()
+        # per-tick aggregates (swarm center etc.) shared by all the scouts
+        self.stats = SwarmStats(self)
+        self.stepping = False
+        # set by recorder.TrajectoryRecorder, gets every frame after a step
+        self.recorder = None
+        if engine == "agent":
+            self.engine = None
+        elif engine == "array":
+            self.engine = ArrayEngine(self, update, backend)
+        else:
+            raise ValueError("engine must be 'agent' or 'array', got {!r}".format(engine))
         self.running = True
+        self.stop_reason = None
+        if termination is True:
+            termination = Termination()
+        self.termination = termination or None
+        if metrics is True:
+            metrics = SwarmMetrics()
+        self.metrics = metrics or None
+        if self.metrics is not None:
+            self.metrics.update(self)
+        if self.termination is not None:
+            self.termination.check(self)
 
     def make_agents(self):
         """
         Create self.population agents, with random positions and starting headings.
         """
-        scout_interval = SCOUT_START_X / self.scout_population
-        # don't want to calculate this in a loop
         # scouts seem to be spaced in intervals along one axis in the paper rather
         # than completely randomly.  It could be they are random and then released
         # one at a time also, but I haven't been able to find anywhere that this is
-        # mentioned.
-        scout_intervals = np.array([scout_interval * i for i in range(self.scout_population)])
-        # add noise to intervals
-        scout_intervals += np.random.rand(self.scout_population) * scout_interval / 2
+        # mentioned.  The intervals get some noise (see SwarmRandom.start_positions).
+        # Uninformed bees are constrained to start near params.u_start_center
+        # The paper uses (CENTER - n/3, CENTER + n/3) for the range but
+        # for 2-dimensions I am using n/2 instead.  That made big swarms start
+        # too sparse to be connected, so the side now grows with sqrt(n)
+        # (params.start_side), which is still 100 for 100 bees.
+        uninformed_start, scout_start = self.rng.start_positions(
+            self.population, self.scout_population, self.params
+        )
         n = self.population
         for i in range(n):
-            # Uninformed bees are constrained to start near U_START_CENTER
-            # The paper uses (CENTER - n/3, CENTER + n/3) for the range but
-            # for 2-dimensions I am using n/2 instead.
-            x = U_START_CENTER[0] - n/2 + self.random.random() * n
-            y = U_START_CENTER[1] - n/2 + self.random.random() * n
-            pos = np.array((x, y))
+            pos = uninformed_start[i].copy()
             # Uninformed bees start with no velocity
             velocity = np.zeros(2)
             # They are still called boids because I didn't want to find and replace
             # every instance of the word boid.
-            boid = Boid(
-                i,
-                self,
-                pos,
-                self.speed,
-                velocity,
-                self.vision,
-                self.separation,
-                **self.factors
-            )
+            if self.compact:
+                boid = CompactBoid(i, self, i)
+            else:
+                boid = Boid(
+                    i,
+                    self,
+                    pos,
+                    self.speed,
+                    velocity,
+                    self.vision,
+                    self.separation,
+                    **self.factors
+                )
             # This stuff adds the agents to the simulation
             self.space.place_agent(boid, pos)
             self.schedule.add(boid)
@@ -131,9 +237,7 @@ class BoidFlockers(Model):
             # the correct position.  The reason they should lead okay doing this is
             # because the correct position is the expected value of scout directions
             scout_id = i - n
-            x = scout_intervals[scout_id]
-            y = U_START_CENTER[1] - n/4 + self.random.random() * n/2
-            pos = np.array((x,y))
+            pos = scout_start[scout_id].copy()
             # This will be max_speed * unit_vector_in_goal_direction
             # scouts are always going max speed or "circling back"
             # the paper does not explain how circling back works but my best
@@ -141,18 +245,67 @@ class BoidFlockers(Model):
             # teleport to the back somehow.  There don't appear to be scouts moving
             # around or away from the goal at any point.
             velocity = np.array([self.vmax, 0])
-            scout = Scout(
-                i,
-                scout_id, # keeps track of when to leave
-                self,
-                pos,
-                self.speed * self.vmax, # scouts always move at max speed
-                velocity,
-                self.vision,
-                self.min_scout_neighbors, # when a scout has fewer neighbors the circle back
-                self.goal
-            )
+            if self.compact:
+                scout = CompactScout(i, scout_id, self, i)
+            else:
+                scout = Scout(
+                    i,
+                    scout_id, # keeps track of when to leave
+                    self,
+                    pos,
+                    self.speed * self.vmax, # scouts always move at max speed
+                    velocity,
+                    self.vision,
+                    self.min_scout_neighbors, # when a scout has fewer neighbors the circle back
+                    self.goal
+                )
             self.space.place_agent(scout, pos)
+            if self.compact:
+                # into self.velocity
+                scout.velocity = velocity
             self.schedule.add(scout)
+        # Per space row: is the agent still in the schedule (scouts leave near
+        # the goal) and is it an uninformed bee.
+        self.active = np.ones(len(self.space._agent_points), dtype=bool)
+        self.uninformed = np.zeros(len(self.space._agent_points), dtype=bool)
+        for agent, row in self.space._agent_to_index.items():
+            self.uninformed[row] = isinstance(agent, (Boid, CompactBoid))
+
     def step(self):
-        self.schedule.step()
\ No newline at end of file
+        # swarm stats are taken once at the start of the tick and every agent
+        # reads that snapshot while stepping
+        profiler = self.profiler
+        if profiler is not None:
+            profiler.begin_tick(self.schedule.steps)
+        self.stats.refresh()
+        self.stepping = True
+        try:
+            if self.engine is None:
+                self.schedule.step()
+            else:
+                self.engine.step()
+        finally:
+            self.stepping = False
+        if profiler is not None:
+            profiler.end_tick(self.schedule.steps)
+        if self.recorder is not None:
+            self.recorder.record(self)
+        if self.metrics is not None:
+            self.metrics.update(self)
+        if self.termination is not None:
+            self.termination.check(self)
+
+    def get_velocities(self):
+        """
+        Velocities of all agents as an array indexed like the space's
+        _agent_points.  This is the engine's own array when there is one, so
+        don't modify it.
+        """
+        if self.engine is not None:
+            return self.engine.velocity
+        if self.compact:
+            return self.velocity
+        velocity = np.empty_like(self.space._agent_points)
+        for agent, row in self.space._agent_to_index.items():
+            velocity[row] = agent.velocity
+        return velocity
\ No newline at end of file
@@ -0,0 +1,272 @@
+"""
+Neighbor indexes for the swarm.
+
+ContinuousSpace.get_neighbors measures the distance to every agent on every
+call, so one tick of the model is O(N^2).  Two uniform grids with cells the
+size of the bees' vision replace that here:
+
+    GridSpace  A drop in ContinuousSpace that keeps every agent filed under
+               its grid cell and moves it between cells in move_agent.  It is
+               always up to date, so the agent path (where bees move one at a
+               time inside a tick) can use it without changing behavior.
+    CellList   A read-only cell list built from a snapshot of all positions in
+               one vectorized pass (an argsort).  It is meant to be rebuilt
+               once per tick and gives all neighbor pairs of many bees at
+               once, which is what the array engine needs.
+
+Both only look at the cells that can hold points within the query radius, so
+a query costs about O(k) for k agents near the point instead of O(N).
+"""
+
+import math
+from time import perf_counter
+
+import numpy as np
+
+from mesa.space import ContinuousSpace
+
+
+class GridSpace(ContinuousSpace):
+    """
+    ContinuousSpace with a uniform grid index for get_neighbors.  Toroidal
+    spaces fall back to the ContinuousSpace lookup.
+    """
+
+    def __init__(self, x_max, y_max, torus, cell_size, x_min=0, y_min=0):
+        """
+        Args:
+            x_max, y_max, torus, x_min, y_min: Same as ContinuousSpace.
+            cell_size: Side length of a grid cell.  Queries with a radius
+                close to the cell size are the cheapest, so this should be
+                the bees' vision.
+        """
+        super().__init__(x_max, y_max, torus, x_min, y_min)
+        if cell_size <= 0:
+            raise ValueError("cell_size must be positive, got {}".format(cell_size))
+        self.cell_size = cell_size
+        # _agent_points is a view of the first _n rows of _buffer so placing
+        # agents doesn't copy every point each time like np.append does.
+        self._buffer = np.empty((0, 2))
+        self._n = 0
+        self._cells = {}
+        self._cell_of = []
+        # bumped whenever an agent is placed, moved or removed so per-tick
+        # caches (see stats.py) can tell when they are out of date
+        self.version = 0
+        # a profiling.TickProfiler to report lookups and moves to, if any
+        self.profiler = None
+
+    def _cell(self, pos):
+        return (
+            math.floor((pos[0] - self.x_min) / self.cell_size),
+            math.floor((pos[1] - self.y_min) / self.cell_size),
+        )
+
+    def place_agent(self, agent, pos):
+        pos = self.torus_adj(pos)
+        if self._n == len(self._buffer):
+            buffer = np.empty((max(16, 2 * len(self._buffer)), 2))
+            buffer[:self._n] = self._buffer[:self._n]
+            self._buffer = buffer
+        idx = self._n
+        self._buffer[idx] = pos
+        self._n += 1
+        self._agent_points = self._buffer[:self._n]
+        self._index_to_agent[idx] = agent
+        self._agent_to_index[agent] = idx
+        cell = self._cell(pos)
+        self._cells.setdefault(cell, set()).add(idx)
+        self._cell_of.append(cell)
+        self.version += 1
+        agent.pos = pos
+
+    def move_agent(self, agent, pos):
+        profiler = self.profiler
+        if profiler is not None:
+            start = perf_counter()
+        pos = self.torus_adj(pos)
+        idx = self._agent_to_index[agent]
+        self._agent_points[idx, 0] = pos[0]
+        self._agent_points[idx, 1] = pos[1]
+        self._refile(idx, pos)
+        self.version += 1
+        agent.pos = pos
+        if profiler is not None:
+            profiler.add("move", perf_counter() - start)
+
+    def move_rows(self, rows, points):
+        """
+        Move the agents at the given rows of _agent_points to the given
+        (len(rows), 2) points in one go.  Unlike move_agent this does not
+        touch agent.pos; the caller is responsible for that.
+        """
+        if not self.torus:
+            out = (
+                (points[:, 0] < self.x_min) | (points[:, 0] >= self.x_max)
+                | (points[:, 1] < self.y_min) | (points[:, 1] >= self.y_max)
+            )
+            if out.any():
+                raise Exception("Point out of bounds, and space non-toroidal.")
+        else:
+            points = points.copy()
+            points[:, 0] = self.x_min + (points[:, 0] - self.x_min) % self.width
+            points[:, 1] = self.y_min + (points[:, 1] - self.y_min) % self.height
+        old = np.floor((self._agent_points[rows] - (self.x_min, self.y_min)) / self.cell_size)
+        new = np.floor((points - (self.x_min, self.y_min)) / self.cell_size)
+        self._agent_points[rows] = points
+        # only the few agents that crossed into another cell need refiling
+        for i in np.nonzero((old != new).any(axis=1))[0]:
+            self._refile(int(rows[i]), points[i])
+        self.version += 1
+        return points
+
+    def _refile(self, idx, pos):
+        cell = self._cell(pos)
+        old = self._cell_of[idx]
+        if cell != old:
+            members = self._cells[old]
+            members.discard(idx)
+            if not members:
+                del self._cells[old]
+            self._cells.setdefault(cell, set()).add(idx)
+            self._cell_of[idx] = cell
+
+    def remove_agent(self, agent):
+        super().remove_agent(agent)
+        self.version += 1
+        # Removing shifts every later row down by one, so just refile
+        # everything.  Nothing in the model removes agents from the space.
+        self._buffer = np.array(self._agent_points, dtype=float).reshape(-1, 2)
+        self._n = len(self._buffer)
+        self._agent_points = self._buffer[:self._n]
+        self._cells = {}
+        self._cell_of = []
+        for idx in range(self._n):
+            cell = self._cell(self._agent_points[idx])
+            self._cells.setdefault(cell, set()).add(idx)
+            self._cell_of.append(cell)
+
+    def get_neighbor_rows(self, pos, radius, include_center=True):
+        """
+        Return (rows, distances) of all points within radius of pos, sorted
+        by row so results come back in the same order as ContinuousSpace.
+        """
+        reach = max(1, math.ceil(radius / self.cell_size))
+        cx, cy = self._cell(pos)
+        cells = self._cells
+        rows = []
+        for x in range(cx - reach, cx + reach + 1):
+            for y in range(cy - reach, cy + reach + 1):
+                members = cells.get((x, y))
+                if members:
+                    rows.extend(members)
+        rows = np.array(rows, dtype=int)
+        rows.sort()
+        deltas = self._agent_points[rows] - np.asarray(pos)
+        dists = deltas[:, 0] ** 2 + deltas[:, 1] ** 2
+        keep = dists <= radius ** 2
+        if not include_center:
+            keep &= dists > 0
+        return rows[keep], np.sqrt(dists[keep])
+
+    def get_neighbors(self, pos, radius, include_center=True):
+        profiler = self.profiler
+        if profiler is not None:
+            start = perf_counter()
+        if self.torus:
+            neighbors = super().get_neighbors(pos, radius, include_center)
+        else:
+            rows, _ = self.get_neighbor_rows(pos, radius, include_center)
+            index_to_agent = self._index_to_agent
+            neighbors = [index_to_agent[i] for i in rows]
+        if profiler is not None:
+            profiler.add("neighbors", perf_counter() - start)
+            profiler.neighbor_query(len(neighbors))
+        return neighbors
+
+
+class CellList:
+    """
+    Static cell list over a snapshot of points (non-toroidal).
+    """
+
+    def __init__(self, points, cell_size):
+        """
+        Args:
+            points: (N,2) array of positions.  Not copied, so don't move the
+                points while the index is in use.
+            cell_size: Side length of a grid cell.
+        """
+        self.points = points
+        self.cell_size = cell_size
+        cells = np.floor(points / cell_size).astype(np.int64)
+        if len(points):
+            self.origin = cells.min(axis=0)
+            self.shape = cells.max(axis=0) - self.origin + 1
+        else:
+            self.origin = np.zeros(2, dtype=np.int64)
+            self.shape = np.ones(2, dtype=np.int64)
+        self.cells = cells - self.origin
+        keys = self.cells[:, 0] * self.shape[1] + self.cells[:, 1]
+        self.order = np.argsort(keys, kind='stable')
+        counts = np.bincount(keys, minlength=int(self.shape[0] * self.shape[1]))
+        self.start = np.concatenate(([0], np.cumsum(counts)))
+
+    def pairs(self, rows, radius):
+        """
+        Find every point within radius of the points at the given rows.
+
+        Returns:
+            (which, j, delta, dist) where which indexes into rows, j is the
+            row of the neighbor, delta = points[j] - points[rows[which]]
+            and dist is its length.  Pairs with dist == 0 (including each
+            point with itself) are left out, like get_neighbors with
+            include_center=False.
+        """
+        rows = np.asarray(rows, dtype=int)
+        reach = max(1, math.ceil(radius / self.cell_size))
+        home = self.cells[rows]
+        whiches, js = [], []
+        for dx in range(-reach, reach + 1):
+            for dy in range(-reach, reach + 1):
+                cx = home[:, 0] + dx
+                cy = home[:, 1] + dy
+                valid = (cx >= 0) & (cx < self.shape[0]) & (cy >= 0) & (cy < self.shape[1])
+                which = np.nonzero(valid)[0]
+                key = cx[which] * self.shape[1] + cy[which]
+                first = self.start[key]
+                counts = self.start[key + 1] - first
+                total = counts.sum()
+                if total == 0:
+                    continue
+                # expand each (bee, cell) into one entry per point in the cell
+                offsets = np.repeat(np.cumsum(counts) - counts, counts)
+                slots = np.repeat(first, counts) + np.arange(total) - offsets
+                whiches.append(np.repeat(which, counts))
+                js.append(self.order[slots])
+        if not whiches:
+            empty = np.empty(0, dtype=int)
+            return empty, empty, np.empty((0, 2)), np.empty(0)
+        which = np.concatenate(whiches)
+        j = np.concatenate(js)
+        delta = self.points[j] - self.points[rows[which]]
+        dist = np.sqrt(delta[:, 0] ** 2 + delta[:, 1] ** 2)
+        keep = (dist <= radius) & (dist > 0)
+        return which[keep], j[keep], delta[keep], dist[keep]
+
+    def query(self, pos, radius):
+        """Return the rows of all points within radius of pos, sorted."""
+        reach = max(1, math.ceil(radius / self.cell_size))
+        cx, cy = np.floor(np.asarray(pos) / self.cell_size).astype(np.int64) - self.origin
+        found = []
+        for x in range(max(0, cx - reach), min(self.shape[0], cx + reach + 1)):
+            key = x * self.shape[1]
+            lo = key + max(0, cy - reach)
+            hi = key + min(self.shape[1], cy + reach + 1)
+            if lo < hi:
+                found.append(self.order[self.start[lo]:self.start[hi]])
+        if not found:
+            return np.empty(0, dtype=int)
+        rows = np.sort(np.concatenate(found))
+        deltas = self.points[rows] - pos
+        return rows[deltas[:, 0] ** 2 + deltas[:, 1] ** 2 <= radius ** 2]
@@ -0,0 +1,92 @@
+"""
+Simulation constants that used to be module globals in boid.py, model.py and
+scout.py, gathered in one immutable object so a process can run different
+configurations back to back without re-importing or monkeypatching.
+
+    params = SwarmParams(goal_x=4000, inertia=0.7)
+    model = BoidFlockers(params=params)
+    faster = params.replace(max_accel=0.5)
+"""
+
+import dataclasses
+import math
+from dataclasses import dataclass
+
+
+@dataclass(frozen=True)
+class SwarmParams:
+    """
+    Attributes:
+        max_accel: Largest change of velocity per step (the combined
+            cohere/avoid/align/random vector is clamped to this).
+        vmax: Maximum bee speed.  Scouts always fly at it and align divides
+            by it to keep the term in [0,1].
+        alpha: Exponent of the avoid rule's normalization.
+        weight_random: Weight of the random walk term (the paper turned it
+            off in experiments).
+        inertia: Fraction of the old velocity kept each step (the paper
+            uses 0.8).
+        goal_x, goal_y: Goal position.  In the paper goal_x goes out to
+            4000, goal_y is probably 200.
+        scout_start_x: Scouts start spread over x in (0, scout_start_x).
+        u_start_center: Center of the square the uninformed bees start in.
+            The paper uses [200,200,200].
+        u_start_spacing: Mean spacing of the uninformed bees at the start.
+            They start in a square of side u_start_spacing * sqrt(n)
+            (see start_side), so the density, and with it the number of
+            neighbors a bee starts with, doesn't depend on the population.
+            The default gives the 100 x 100 square 100 bees always had.
+        close_to_goal: Distance from the swarm center to the goal at which
+            the scouts start leaving.
+        arrival_radius: Distance from the swarm center to the goal at which
+            a run counts as arrived (termination.py).  Smaller than
+            close_to_goal so the scouts get to leave first.
+    """
+    max_accel: float = 0.3
+    vmax: float = 1.55
+    alpha: float = 0.75
+    weight_random: float = 0.0
+    inertia: float = 0.8
+    goal_x: float = 900
+    goal_y: float = 150
+    scout_start_x: float = 75
+    u_start_center: tuple = (150, 150)
+    u_start_spacing: float = 10
+    close_to_goal: float = 75
+    arrival_radius: float = 50
+
+    def __post_init__(self):
+        center = tuple(float(c) for c in self.u_start_center)
+        if len(center) != 2:
+            raise ValueError("u_start_center must be an (x, y) pair, got {!r}".format(self.u_start_center))
+        object.__setattr__(self, "u_start_center", center)
+        positive = ("max_accel", "vmax", "scout_start_x", "u_start_spacing")
+        non_negative = ("alpha", "weight_random", "close_to_goal", "arrival_radius")
+        for name in positive:
+            if not getattr(self, name) > 0:
+                raise ValueError("{} must be positive, got {!r}".format(name, getattr(self, name)))
+        for name in non_negative:
+            if not getattr(self, name) >= 0:
+                raise ValueError("{} must be non-negative, got {!r}".format(name, getattr(self, name)))
+        if not 0 <= self.inertia <= 1:
+            raise ValueError("inertia must be in [0, 1], got {!r}".format(self.inertia))
+
+    @property
+    def goal(self):
+        return (self.goal_x, self.goal_y)
+
+    def start_side(self, population):
+        """Side of the square population uninformed bees start in."""
+        return self.u_start_spacing * math.sqrt(population)
+
+    def replace(self, **changes):
+        """A copy with some fields changed (validated again)."""
+        return dataclasses.replace(self, **changes)
+
+    def asdict(self):
+        return dataclasses.asdict(self)
+
+    @classmethod
+    def fields(cls):
+        """Names of all the parameters."""
+        return tuple(f.name for f in dataclasses.fields(cls))
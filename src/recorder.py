@@ -0,0 +1,276 @@
+"""
+Record full trajectories of a run to disk and read them back.
+
+A recording is a directory:
+
+    header.json           model parameters, number of agents, chunk size and
+                          the number of frames written so far
+    types.npy             (N,) int8 agent type per space row (0 uninformed, 1 scout)
+    pos_00000.npy ...     (chunk, N, 2) float32 positions
+    vel_00000.npy ...     (chunk, N, 2) float32 velocities
+    active_00000.npy ...  (chunk, N) bool, False once a scout has left
+
+Frame t is the state after t steps (frame 0 is the starting state).  Frames
+are buffered in memory one chunk at a time and each full chunk is written as
+plain .npy files, so memory use doesn't grow with the length of the run and
+the reader can memory-map the chunks instead of loading them.  The recorder
+only writes into an empty directory (or replaces the recording in it with
+overwrite=True), so chunks of an older run can't end up in a new one.
+
+    recorder = TrajectoryRecorder("runs/trial0", model)
+    for _ in range(5000):
+        model.step()
+    recorder.close()
+
+    trajectory = Trajectory("runs/trial0")
+    front = trajectory.positions(ticks=slice(1000, 1200), agents=slice(0, 500))
+"""
+
+import glob
+import json
+import operator
+import os
+
+import numpy as np
+
+UNINFORMED = 0
+SCOUT = 1
+
+FIELDS = ("pos", "vel", "active")
+FORMAT_VERSION = 1
+
+
+def model_params(model):
+    """The BoidFlockers arguments needed to describe (or rebuild) a run."""
+    params = dict(
+        population=model.population,
+        scout_population=model.scout_population,
+        width=model.space.width,
+        height=model.space.height,
+        speed=model.speed,
+        vision=model.vision,
+        separation=model.separation,
+        goal=np.asarray(model.goal).tolist(),
+        vmax=model.vmax,
+        min_scout_neighbors=model.min_scout_neighbors,
+        seed=model._seed,
+        engine="agent" if model.engine is None else "array",
+        compact=model.compact,
+        metrics=model.metrics is not None,
+        # the rest of params.SwarmParams, goal and vmax are in it as well
+        swarm_params=model.params.asdict(),
+    )
+    params.update(model.factors)
+    if model.engine is not None:
+        params["update"] = model.engine.update
+        params["backend"] = model.engine.backend
+    return params
+
+
+def _to_json(value):
+    # json.dump's default: numpy scalars sneak into the params (and into the
+    # sweep's result rows, which use this as well)
+    if isinstance(value, np.generic):
+        return value.item()
+    raise TypeError("can't encode {!r} as JSON".format(value))
+
+
+class TrajectoryRecorder:
+    """
+    Appends one frame per model step to a recording directory.  Creating the
+    recorder writes the header and frame 0 and attaches it to model.recorder,
+    which makes BoidFlockers.step call record after every step.
+    """
+
+    def __init__(self, path, model, chunk_ticks=256, overwrite=False):
+        """
+        Args:
+            path: Directory to write to.  Created if it doesn't exist.  It
+                has to be empty, chunks left over from another recording
+                would be read back as part of this one.
+            model: The BoidFlockers model to record.
+            chunk_ticks: Frames per chunk file.  Bigger chunks mean fewer
+                files, smaller ones less memory while recording.
+            overwrite: Delete a recording already in path instead of
+                raising FileExistsError.
+        """
+        self._prepare(path, overwrite)
+        self.path = path
+        self.chunk_ticks = chunk_ticks
+        n = len(model.space._agent_points)
+        self.n_agents = n
+        self._buffers = {
+            "pos": np.empty((chunk_ticks, n, 2), dtype=np.float32),
+            "vel": np.empty((chunk_ticks, n, 2), dtype=np.float32),
+            "active": np.empty((chunk_ticks, n), dtype=bool),
+        }
+        self._fill = 0
+        self._chunks = 0
+        self.n_ticks = 0
+        self.header = {
+            "format_version": FORMAT_VERSION,
+            "params": model_params(model),
+            "n_agents": n,
+            "chunk_ticks": chunk_ticks,
+            "n_ticks": 0,
+            "start_tick": model.schedule.steps,
+        }
+        types = np.where(model.uninformed, UNINFORMED, SCOUT).astype(np.int8)
+        np.save(os.path.join(path, "types.npy"), types)
+        self._write_header()
+        model.recorder = self
+        self.record(model)
+
+    @staticmethod
+    def _prepare(path, overwrite):
+        os.makedirs(path, exist_ok=True)
+        if not os.listdir(path):
+            return
+        if not overwrite:
+            raise FileExistsError("{} is not empty, pass overwrite=True to replace the recording in it".format(path))
+        old = [os.path.join(path, name) for name in ("header.json", "header.json.tmp", "types.npy")]
+        for field in FIELDS:
+            old += glob.glob(os.path.join(path, "{}_*.npy".format(field)))
+        for name in old:
+            if os.path.exists(name):
+                os.remove(name)
+
+    def record(self, model):
+        """Append the model's current state as the next frame."""
+        frame = self._fill
+        self._buffers["pos"][frame] = model.space._agent_points
+        self._buffers["vel"][frame] = model.get_velocities()
+        self._buffers["active"][frame] = model.active
+        self._fill += 1
+        self.n_ticks += 1
+        if self._fill == self.chunk_ticks:
+            self.flush()
+
+    def flush(self):
+        """Write the buffered frames as a chunk (possibly a short one)."""
+        if self._fill == 0:
+            return
+        for field in FIELDS:
+            name = "{}_{:05d}.npy".format(field, self._chunks)
+            np.save(os.path.join(self.path, name), self._buffers[field][:self._fill])
+        self._chunks += 1
+        self._fill = 0
+        self._write_header()
+
+    def close(self, model=None):
+        """Write what is left and detach from the model."""
+        self.flush()
+        if model is not None and getattr(model, "recorder", None) is self:
+            model.recorder = None
+
+    def _write_header(self):
+        self.header["n_ticks"] = self.n_ticks - self._fill
+        self.header["n_chunks"] = self._chunks
+        tmp = os.path.join(self.path, "header.json.tmp")
+        with open(tmp, "w") as f:
+            json.dump(self.header, f, indent=2, default=_to_json)
+        os.replace(tmp, os.path.join(self.path, "header.json"))
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class Trajectory:
+    """
+    Read-only access to a recording.  Chunks are memory-mapped when first
+    used, so only the frames and agents that are sliced get read from disk.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        with open(os.path.join(path, "header.json")) as f:
+            self.header = json.load(f)
+        self.params = self.header["params"]
+        self.n_agents = self.header["n_agents"]
+        self.n_ticks = self.header["n_ticks"]
+        self.chunk_ticks = self.header["chunk_ticks"]
+        self.types = np.load(os.path.join(path, "types.npy"), mmap_mode="r")
+        self._chunks = {}
+
+    def __len__(self):
+        return self.n_ticks
+
+    def _chunk(self, field, k):
+        key = (field, k)
+        if key not in self._chunks:
+            name = "{}_{:05d}.npy".format(field, k)
+            self._chunks[key] = np.load(os.path.join(self.path, name), mmap_mode="r")
+        return self._chunks[key]
+
+    def _tick(self, tick):
+        # a frame number, negative ones count from the end
+        n = self.n_ticks
+        index = operator.index(tick)
+        if index < 0:
+            index += n
+        if not 0 <= index < n:
+            raise IndexError("tick {} out of range for a recording of {} frames".format(tick, n))
+        return index
+
+    def _read(self, field, ticks, agents):
+        if isinstance(ticks, slice):
+            start, stop, step = ticks.indices(self.n_ticks)
+        else:
+            start = self._tick(ticks)
+            stop, step = start + 1, 1
+        if step < 1:
+            raise ValueError("ticks must be a slice with a positive step")
+        first = start // self.chunk_ticks
+        last = max(first, (stop - 1) // self.chunk_ticks)
+        parts = []
+        for k in range(first, last + 1):
+            base = k * self.chunk_ticks
+            lo = max(start, base)
+            # stay on the step grid across chunk boundaries
+            lo += (start - lo) % step
+            hi = min(stop, base + self.chunk_ticks)
+            if lo >= hi:
+                continue
+            parts.append(self._chunk(field, k)[lo - base:hi - base:step, agents])
+        if not isinstance(ticks, slice):
+            return parts[0][0]
+        if len(parts) == 1:
+            # a view of the memory map, nothing is copied
+            return parts[0]
+        if not parts:
+            return self._chunk(field, 0)[0:0, agents]
+        return np.concatenate(parts)
+
+    def positions(self, ticks=slice(None), agents=slice(None)):
+        """
+        Positions as a (ticks, agents, 2) float32 array.
+
+        Args:
+            ticks: A frame number (negative ones count from the end, out
+                of range ones raise IndexError) or a slice of frames.
+            agents: Anything numpy can index the agent axis with.  With a
+                slice and a tick range inside one chunk the result is a view
+                of the memory-mapped file.
+        """
+        return self._read("pos", ticks, agents)
+
+    def velocities(self, ticks=slice(None), agents=slice(None)):
+        """Velocities, indexed like positions."""
+        return self._read("vel", ticks, agents)
+
+    def active(self, ticks=slice(None), agents=slice(None)):
+        """(ticks, agents) bool mask of agents still in the schedule."""
+        return self._read("active", ticks, agents)
+
+    @property
+    def scouts(self):
+        """Agent indices (space rows) of the scouts."""
+        return np.nonzero(self.types == SCOUT)[0]
+
+    @property
+    def uninformed(self):
+        """Agent indices (space rows) of the uninformed bees."""
+        return np.nonzero(self.types == UNINFORMED)[0]
@@ -0,0 +1,162 @@
+"""
+Play back a recorded run (see recorder.py) in the browser without
+re-simulating it.
+
+    python -m src.replay runs/trial0
+    python -m src.replay runs/trial0 --rate 120
+
+The recording is shown on the same canvas as the live model.  Frames are
+scaled to canvas coordinates a whole chunk at a time with numpy and sent as
+packed float32 arrays instead of one portrayal dict per bee.
+
+Playback runs on the server (a live.LiveServer): a thread steps through the
+recording at --rate frames per second (default 60) and the page draws each
+frame as soon as it arrives, so the page's frames-per-second slider (capped
+at 20) isn't used.  The "Start tick" slider scrubs (press reset to jump
+there) and "Frame skip" shows every k-th frame, which plays the run k times
+faster at the same rate.
+"""
+
+import argparse
+
+import numpy as np
+
+from mesa import Model
+from mesa.visualization.ModularVisualization import VisualizationElement
+from mesa.visualization.UserParam import UserSettableParameter
+
+from .live import LiveServer
+from .recorder import Trajectory, UNINFORMED, SCOUT
+from .SimpleContinuousModule import GROUP_STYLES, scale_to_canvas, pack_points
+
+
+class ReplayModel(Model):
+    """
+    Stands in for BoidFlockers in the server, stepping through the frames of
+    a recording instead of simulating.
+    """
+
+    def __init__(self, path, start_tick=0, frame_skip=1):
+        """
+        Args:
+            path: Recording directory.
+            start_tick: Frame to start playing from.
+            frame_skip: Frames to advance per step (1 plays every frame).
+        """
+        self.path = path
+        self.trajectory = Trajectory(path)
+        self.tick = int(min(max(start_tick, 0), len(self.trajectory) - 1))
+        self.frame_skip = max(1, int(frame_skip))
+        self.goal = np.array(self.trajectory.params["goal"], dtype=float)
+        self.running = True
+
+    def step(self):
+        last = len(self.trajectory) - 1
+        self.tick = min(self.tick + self.frame_skip, last)
+        if self.tick == last:
+            self.running = False
+
+
+class ReplayCanvas(VisualizationElement):
+    """
+    Renders a ReplayModel on simple_continuous_canvas.js using packed float32
+    point groups.
+    """
+    local_includes = ["src/simple_continuous_canvas.js"]
+
+    def __init__(self, canvas_height=400, canvas_width=1000, styles_every_frame=False):
+        """
+        Args:
+            canvas_height, canvas_width: Size of the canvas in pixels.
+            styles_every_frame: Send the styles with every frame, for a
+                LiveServer where viewers can join in the middle of a run.
+        """
+        self.canvas_height = canvas_height
+        self.canvas_width = canvas_width
+        self.styles_every_frame = styles_every_frame
+        self.js_code = "elements.push(new Simple_Continuous_Module({}, {}));".format(
+            canvas_width, canvas_height
+        )
+        self._styled_model = None
+        self._cache_key = None
+        self._cache = None
+
+    def _scale(self, trajectory, points):
+        params = trajectory.params
+        return scale_to_canvas(
+            points, 0, params["width"], 0, params["height"], self.canvas_width, self.canvas_height
+        )
+
+    def frame(self, model):
+        """The current frame of the model in canvas coordinates."""
+        trajectory = model.trajectory
+        chunk_ticks = trajectory.chunk_ticks
+        if model.frame_skip >= chunk_ticks:
+            # every frame is in a different chunk, no point scaling whole chunks
+            return self._scale(trajectory, trajectory.positions(model.tick))
+        k = model.tick // chunk_ticks
+        key = (id(trajectory), k)
+        if key != self._cache_key:
+            frames = trajectory.positions(slice(k * chunk_ticks, (k + 1) * chunk_ticks))
+            self._cache = self._scale(trajectory, frames)
+            self._cache_key = key
+        return self._cache[model.tick - k * chunk_ticks]
+
+    def render(self, model):
+        trajectory = model.trajectory
+        points = self.frame(model)
+        types = trajectory.types
+        scouts = (types == SCOUT) & trajectory.active(model.tick)
+        data = {
+            "packed": True,
+            "points": {
+                "uninformed": pack_points(points[types == UNINFORMED]),
+                "scout": pack_points(points[scouts]),
+                "goal": pack_points(self._scale(trajectory, model.goal[None, :])),
+            },
+        }
+        # a new model means a (re)loaded page, which needs the styles again
+        if self.styles_every_frame or model is not self._styled_model:
+            data["styles"] = GROUP_STYLES
+            self._styled_model = model
+        return data
+
+
+def make_server(path, canvas_height=400, canvas_width=1000, rate=60):
+    """
+    Build a LiveServer that replays the recording at path.
+
+    Args:
+        path: Recording directory.
+        canvas_height, canvas_width: Size of the canvas in pixels.
+        rate: Frames per second to play back at.
+    """
+    n_ticks = len(Trajectory(path))
+    model_params = {
+        "path": path,
+        "start_tick": UserSettableParameter(
+            "slider", "Start tick", 0, 0, max(0, n_ticks - 1), 1,
+            description="Frame to start from, press reset to jump there"
+        ),
+        "frame_skip": UserSettableParameter(
+            "slider", "Frame skip", 1, 1, 50, 1, description="Show every k-th frame"
+        ),
+    }
+    # every step is a frame, and every reset restarts from "Start tick"
+    return LiveServer(
+        ReplayModel, [ReplayCanvas(canvas_height, canvas_width, styles_every_frame=True)], "Boids replay",
+        model_params, tps=rate, fps=None, restart_on_reset=True
+    )
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Replay a recorded BoidFlockers run.")
+    parser.add_argument("path", help="recording directory written by TrajectoryRecorder")
+    parser.add_argument("--port", type=int, default=None)
+    parser.add_argument("--rate", type=float, default=60, help="frames per second to play back at")
+    args = parser.parse_args(argv)
+    make_server(args.path, rate=args.rate).launch(port=args.port)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,115 @@
+"""
+Seeded random numbers for BoidFlockers that don't depend on who draws first.
+
+Boid.random used to draw from the global np.random one bee at a time (with a
+rejection loop), so a run depended on the order the agents stepped in, on
+whatever else used np.random in the process and on the engine.  SwarmRandom
+gives every (stream, tick) its own counter-based Philox generator derived
+from the model's seed and draws one block of numbers per tick indexed by
+space row.  A bee always gets the numbers of its row no matter if it is
+stepped by the agent loop, the array engine, an Ensemble or in another
+process, and a bee that doesn't need its numbers doesn't shift anybody
+else's.
+
+    rng = SwarmRandom(seed, n_rows)
+    rng.random_walk(tick, rows)   # (k,2) random-walk terms, like Boid.random
+    rng.uniform(tick, rows)       # one U[0,1) per row (scout resets)
+    rng.generator(INIT)           # a Generator for the starting positions
+
+The random walk's length is exponential(.5) truncated to [0,1], drawn by
+inverting its CDF instead of redrawing values above 1.
+"""
+
+import numpy as np
+
+# stream keys
+INIT = 0
+TICK = 1
+
+# columns of a tick's block
+_BETA, _DIR_X, _DIR_Y, _UNIFORM = range(4)
+
+# exponential(scale=.5) truncated to [0, 1]
+_SCALE = .5
+_MASS = 1 - np.exp(-1 / _SCALE)
+
+
+def run_seed(base_seed, point, replicate):
+    """Seed for one run, fixed by the sweep seed and the run's place in the grid."""
+    sequence = np.random.SeedSequence(base_seed, spawn_key=(point, replicate))
+    return int(sequence.generate_state(1)[0])
+
+
+class SwarmRandom:
+    """
+    Counter-based random streams of one model.
+
+    Attributes:
+        seed_sequence: The np.random.SeedSequence every stream derives from.
+        size: Number of rows a tick's block has (agents in the space).
+    """
+
+    def __init__(self, seed=None, size=0):
+        """
+        Args:
+            seed: int, None (fresh entropy) or an np.random.SeedSequence.
+            size: Number of space rows.
+        """
+        if not isinstance(seed, np.random.SeedSequence):
+            seed = np.random.SeedSequence(seed)
+        self.seed_sequence = seed
+        self.size = size
+        self._tick = None
+        self._block = None
+
+    def generator(self, *key):
+        """A Philox Generator for the stream identified by key (ints)."""
+        sequence = np.random.SeedSequence(
+            self.seed_sequence.entropy, spawn_key=self.seed_sequence.spawn_key + key
+        )
+        return np.random.Generator(np.random.Philox(sequence))
+
+    def block(self, tick):
+        """The (size, 4) uniforms of a tick.  Computed once per tick."""
+        if tick != self._tick:
+            self._block = self.generator(TICK, tick).random((self.size, 4))
+            self._tick = tick
+        return self._block
+
+    def random_walk(self, tick, rows):
+        """
+        Random-walk terms of the bees at rows for a tick: a direction with
+        both components uniform in [-1,1] (normalized) times a length from
+        exponential(.5) truncated to [0,1].
+        """
+        u = self.block(tick)[rows]
+        beta = -_SCALE * np.log1p(-u[:, _BETA] * _MASS)
+        r = u[:, [_DIR_X, _DIR_Y]] * 2 - 1
+        r /= np.linalg.norm(r, axis=1)[:, None]
+        return beta[:, None] * r
+
+    def uniform(self, tick, rows):
+        """One U[0,1) per row for a tick."""
+        return self.block(tick)[rows, _UNIFORM]
+
+    def start_positions(self, population, scout_population, params):
+        """
+        Starting positions of the uninformed bees and of the scouts (see
+        BoidFlockers.make_agents for the layout).
+
+        Returns:
+            ((population, 2), (scout_population, 2)) arrays.
+        """
+        init = self.generator(INIT)
+        n = population
+        side = params.start_side(n)
+        start_x, start_y = params.u_start_center
+        # scouts are spaced in intervals along x plus noise, the uninformed
+        # bees are uniform in a side x side square around u_start_center
+        scout_interval = params.scout_start_x / scout_population if scout_population else 0
+        scouts = np.empty((scout_population, 2))
+        scouts[:, 0] = scout_interval * np.arange(scout_population)
+        scouts[:, 0] += init.random(scout_population) * scout_interval / 2
+        uninformed = init.random((n, 2)) * side + (start_x - side/2, start_y - side/2)
+        scouts[:, 1] = start_y - side/4 + init.random(scout_population) * side/2
+        return uninformed, scouts
@@ -1,6 +1,8 @@
 import numpy as np
 from mesa import Agent
 
+from .profiling import timed, timed_step
+
 #########################################################################
 """
 This file implements Scout Bee agents from the paper and our own modified
@@ -63,16 +65,16 @@ class Scout(Agent):
     
     # Scouts fly through on line parallel line from swarm center to goal.
     # This requires finding the swarm center.  In the paper they remove disconnected
-    # Bees when doing this.  Here, we will just assume bees don't disconnect and remove
-    # trials where they do.  We can keep track of how many trials we remove to get an idea
-    # of how often disconnects take place.
+    # Bees when doing this.  The model's swarm stats (stats.py) do the same: the
+    # center is the mean of the biggest connected group of bees.  It is computed
+    # once per tick and shared by all the scouts.
+    @timed("center")
     def get_center(self):
-        points = self.model.space._agent_points
-        return np.array([np.mean(points[:,0]), np.mean(points[:,1])])
+        return self.model.stats.center
 
+    @timed("furthest_x")
     def get_furthest_uninformed_x(self):
-        uninformed = np.array([a.pos for a in self.model.schedule._agents.values() if a.unique_id < self.model.population])
-        return np.max(uninformed[:,0])
+        return self.model.stats.furthest_uninformed_x
 
     def reset(self):
         # we want to restart along the same line.  To do this:
@@ -82,8 +84,10 @@ class Scout(Agent):
         # on using point slope formula (i.e find m and b)
         # new_pos[y] = m * min_x + b
         # Add some randomness to x
-        min_x = np.min(self.model.space._agent_points[:,0]) + self.random.random() * 2
-        m = (self.get_center[1] - self.goal[1]) / (self.get_center[0] - self.goal[0])
+        row = self.model.space._agent_to_index[self]
+        min_x = self.model.stats.min_x + self.model.rng.uniform(self.model.schedule.steps, row) * 2
+        center = self.get_center()
+        m = (center[1] - self.goal[1]) / (center[0] - self.goal[0])
         # (y = mx + b => y - mx = b)
         b = self.pos[1] - m * self.pos[0]
         new_y = m * min_x + b
@@ -98,11 +102,14 @@ class Scout(Agent):
     # I think this does need to be called from here
     def disappear(self):
         self.model.schedule.remove(self)
+        self.model.active[self.model.space._agent_to_index[self]] = False
+        self.model.stats.invalidate()
 
+    @timed_step("scout")
     def step(self):
         # distance from goal where scouts disappear
         # distance is measured from swarm center
-        close_to_goal = 75
+        close_to_goal = self.model.params.close_to_goal
         distance_from_goal = np.linalg.norm(self.goal - self.get_center())
         # When close to goal gradually remove bees
         if distance_from_goal < close_to_goal:
@@ -111,7 +118,7 @@ class Scout(Agent):
             else:
                 self.leave_counter -= 1
         # When scout is in front go back
-        elif len(self.model.space.get_neighbors(self.pos, self.vision * 1.5, False)) <= self.min_neighbors and self.pos[0] > self.get_furthest_uninformed_x():
+        elif self.model.stats.scout_neighbors(self) <= self.min_neighbors and self.pos[0] > self.get_furthest_uninformed_x():
             new_pos = self.reset()
             self.model.space.move_agent(self, new_pos)
         # In normal instances, move towards goal
@@ -1,50 +1,79 @@
 # See https://github.com/projectmesa/mesa/blob/main/examples/boid_flockers/boid_flockers/server.py
 # This is being used as a starting point for our project
 from mesa.visualization.ModularVisualization import ModularServer
+from mesa.visualization.modules import ChartModule
 
-from .boid import Boid
-from .scout import Scout
-from .goal import Goal
 from .model import BoidFlockers
-from .SimpleContinuousModule import SimpleCanvas
-
-
-def boid_draw(agent):
-    portrayal = None
-    if isinstance(agent, Boid):
-        portrayal = {
-            'Shape': 'circle',
-            'r': 2,
-            'Filled': 'true',
-            'Color': 'Red'
-        }
-    elif isinstance(agent, Scout):
-        portrayal = {
-            'Shape': 'circle',
-            'r': 4,
-            'Filled': 'true',
-            'Color': 'Blue'
-        }
-    elif isinstance(agent, Goal):
-        portrayal = {
-            'Shape': 'cirlcle',
-            'r': 6,
-            'Filled': 'true',
-            'Color': 'Red'
-        }
-
-    return portrayal
-
-
-boid_canvas = SimpleCanvas(boid_draw, 400, 1000)
-# just use defaults
-# model_params = {
-#     "population": 100,
-#     "width": 100,
-#     "height": 100,
-#     "speed": 5,
-#     "vision": 10,
-#     "separation": 2,
-# }
-
-server = ModularServer(BoidFlockers, [boid_canvas], "Boids")
\ No newline at end of file
+from .SimpleContinuousModule import BatchedCanvas
+from .live import LiveServer
+
+
+class ProfileChart(ChartModule):
+    """
+    Line chart of the per tick timings (in ms) from the model's profiler,
+    see profiling.py.  Series labels are "wall" or phase names.
+    """
+
+    def render(self, model):
+        record = model.profiler.last if model.profiler is not None else None
+        if record is None:
+            return [0 for _ in self.series]
+        values = []
+        for s in self.series:
+            name = s["Label"]
+            seconds = record["wall"] if name == "wall" else record["phases"].get(name, 0)
+            values.append(1000 * seconds)
+        return values
+
+
+# Set to True to profile the model and chart where the time goes each tick
+PROFILE = False
+
+
+def make_server(profile=PROFILE, live=False, tps=None, fps=20):
+    """
+    Build the ModularServer for the live model.  Nothing is built when this
+    module is imported, run.py calls this when it launches.
+
+    Args:
+        profile: Profile the model and chart where the time goes each tick.
+        live: Build a live.LiveServer instead, which runs the model in its
+            own thread and lets any number of viewers watch the same run.
+        tps, fps: Ticks per second (None: as fast as it goes) and frames
+            per second of the LiveServer.
+    """
+    # BatchedCanvas draws the bees in the GROUP_STYLES like SimpleCanvas would
+    # but sends packed arrays instead of a dict per bee, which keeps the browser
+    # responsive with thousands of bees.  Use every=k to only send every k-th
+    # frame or max_points=n to draw a subset of the uninformed bees.
+    # A live server sends one frame to viewers that joined at different
+    # times, so every frame carries the styles.
+    boid_canvas = BatchedCanvas(400, 1000, styles_every_frame=live)
+    # just use defaults
+    # model_params = {
+    #     "population": 100,
+    #     "width": 100,
+    #     "height": 100,
+    #     "speed": 5,
+    #     "vision": 10,
+    #     "separation": 2,
+    # }
+
+    elements = [boid_canvas]
+    model_params = {}
+    if profile:
+        elements.append(ProfileChart([
+            {"Label": "wall", "Color": "Black"},
+            {"Label": "neighbors", "Color": "Red"},
+            {"Label": "separate", "Color": "Orange"},
+            {"Label": "cohere", "Color": "Green"},
+            {"Label": "align", "Color": "Purple"},
+            {"Label": "stats", "Color": "Blue"},
+            {"Label": "move", "Color": "Gray"},
+            {"Label": "render", "Color": "Brown"},
+        ]))
+        model_params["profile"] = True
+
+    if live:
+        return LiveServer(BoidFlockers, elements, "Boids", model_params, tps=tps, fps=fps)
+    return ModularServer(BoidFlockers, elements, "Boids", model_params)
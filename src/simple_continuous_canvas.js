@@ -37,6 +37,24 @@ var ContinuousVisualization = function(height, width, context) {
 
 	};
 
+	// Draw many circles with the same style as one path, points is a
+	// Float32Array of x,y pairs
+	this.drawCircles = function(points, radius, color, fill) {
+		context.beginPath();
+		for (var i = 0; i < points.length; i += 2) {
+			var cx = points[i] * width;
+			var cy = points[i + 1] * height;
+			context.moveTo(cx + radius, cy);
+			context.arc(cx, cy, radius, 0, Math.PI * 2, false);
+		}
+		context.strokeStyle = color;
+		context.stroke();
+		if (fill) {
+			context.fillStyle = color;
+			context.fill();
+		}
+	};
+
 	this.drawRectange = function(x, y, w, h, color, fill) {
 		context.beginPath();
 		var dx = w * width;
@@ -77,7 +95,32 @@ var Simple_Continuous_Module = function(canvas_width, canvas_height) {
 	var context = canvas.getContext("2d");
 	var canvasDraw = new ContinuousVisualization(canvas_width, canvas_height, context);
 
+	// Styles of packed point groups, the server only sends them when they change
+	var styles = {};
+
+	var decodePoints = function(packed) {
+		var raw = atob(packed);
+		var bytes = new Uint8Array(raw.length);
+		for (var i = 0; i < raw.length; i++)
+			bytes[i] = raw.charCodeAt(i);
+		return new Float32Array(bytes.buffer);
+	};
+
 	this.render = function(data) {
+		// null means the server skipped this frame, keep the last one up
+		if (data === null)
+			return;
+		if (data.packed) {
+			if (data.styles)
+				Object.assign(styles, data.styles);
+			canvasDraw.resetCanvas();
+			for (var name in data.points) {
+				var style = styles[name];
+				if (style && style.Shape == "circle")
+					canvasDraw.drawCircles(decodePoints(data.points[name]), style.r, style.Color, style.Filled);
+			}
+			return;
+		}
 		canvasDraw.resetCanvas();
 		canvasDraw.draw(data);
 	};
@@ -0,0 +1,163 @@
+"""
+Swarm-wide numbers that the scouts need every step.
+
+Scout.get_center, get_furthest_uninformed_x, reset and the neighbor count all
+used to scan the whole swarm, and every scout did it again on every step.
+SwarmStats computes them once per tick from one snapshot of the positions and
+the scouts read them from model.stats.
+
+The snapshot is taken when the model starts a step, so every scout in a tick
+sees the swarm as it was at the start of that tick.  Moving agents outside of
+a step (e.g. placing them by hand) invalidates it and it is recomputed the
+next time it is read.
+"""
+
+import numpy as np
+
+from .connectivity import ConnectivityTracker
+from .neighbors import CellList
+from .profiling import timed
+
+
+def connected_components(n, i, j):
+    """
+    Label the connected components of the graph with nodes 0..n-1 and edges
+    (i[k], j[k]).  Every node gets the smallest node number in its component
+    as its label.
+    """
+    parent = np.arange(n)
+    while True:
+        # hook the root with the bigger number under the smaller one
+        a = parent[i]
+        b = parent[j]
+        differ = a != b
+        if not differ.any():
+            return parent
+        lo = np.minimum(a[differ], b[differ])
+        hi = np.maximum(a[differ], b[differ])
+        np.minimum.at(parent, hi, lo)
+        # pointer jumping until every node points straight at its root
+        while True:
+            grand = parent[parent]
+            if np.array_equal(grand, parent):
+                break
+            parent = grand
+
+
+class SwarmStats:
+    """
+    Per-tick aggregates of a BoidFlockers swarm.  Only agents still in the
+    schedule count (scouts that disappeared near the goal are left out).
+
+    Attributes:
+        index: CellList over all points of the space at the snapshot.  The
+            array engine reuses it for the tick.
+        labels: Connected component label per space row (rows of inactive
+            agents are labelled by themselves).  Two bees are connected if
+            they are within vision of each other.
+        connectivity: The ConnectivityTracker behind labels and the main
+            component.  Its on_disconnect listeners are called the first
+            time an uninformed bee is outside the main component.
+        main_component: Space rows of the agents in the biggest component.
+        n_components: Number of connected components among active agents.
+        centroid: Mean position of all active agents.
+        center: Mean position of the main component.  This is the swarm
+            center from the paper, which leaves out disconnected bees.
+        furthest_uninformed_x: Largest x of any uninformed bee.
+        min_x: Smallest x of any active agent.
+        n_disconnected: Number of uninformed bees outside the main component.
+            Scouts are left out since they start behind the swarm.
+    """
+
+    def __init__(self, model):
+        self.model = model
+        self.version = None
+        self._index = None
+        self.connectivity = ConnectivityTracker(model.vision)
+
+    def invalidate(self):
+        """Force a recompute at the next refresh (e.g. an agent left)."""
+        self.version = None
+
+    def refresh(self):
+        """Recompute everything if agents moved since the last snapshot."""
+        if self.version != self.model.space.version:
+            self.update()
+
+    @timed("stats")
+    def update(self):
+        model = self.model
+        space = model.space
+        points = space._agent_points
+        active_mask = model.active
+        active = np.nonzero(active_mask)[0]
+
+        self._index = CellList(points, space.cell_size)
+        # components are tracked incrementally, usually without querying
+        # the neighbors of most bees
+        tracker = self.connectivity
+        self._labels = tracker.update(self._index, active_mask, model.uninformed, model.schedule.steps)
+        if model.profiler is not None:
+            model.profiler.neighbor_query(tracker.found, tracker.queries)
+        self._main_component = tracker.main_component
+        self._n_components = tracker.n_components
+        self._n_disconnected = tracker.n_disconnected
+
+        self._centroid = points[active].mean(axis=0)
+        self._center = tracker.centroid
+        self._furthest_uninformed_x = points[active_mask & model.uninformed, 0].max(initial=-np.inf)
+        self._min_x = points[active, 0].min()
+
+        # neighbor counts for the scouts' "am I in front of the swarm" check
+        scouts = np.nonzero(active_mask & ~model.uninformed)[0]
+        which, j, _, _ = self._index.pairs(scouts, model.vision * 1.5)
+        counts = np.bincount(which[active_mask[j]], minlength=len(scouts))
+        self._scout_counts = dict(zip(scouts.tolist(), counts.tolist()))
+
+        self.version = space.version
+
+    def _current(self):
+        # inside a step everyone reads the snapshot from the start of the tick
+        if self._index is None or not self.model.stepping:
+            self.refresh()
+        return self
+
+    @property
+    def index(self):
+        return self._current()._index
+
+    @property
+    def labels(self):
+        return self._current()._labels
+
+    @property
+    def main_component(self):
+        return self._current()._main_component
+
+    @property
+    def n_components(self):
+        return self._current()._n_components
+
+    @property
+    def n_disconnected(self):
+        return self._current()._n_disconnected
+
+    @property
+    def centroid(self):
+        return self._current()._centroid
+
+    @property
+    def center(self):
+        return self._current()._center
+
+    @property
+    def furthest_uninformed_x(self):
+        return self._current()._furthest_uninformed_x
+
+    @property
+    def min_x(self):
+        return self._current()._min_x
+
+    def scout_neighbors(self, scout):
+        """Number of active agents within 1.5 * vision of the scout."""
+        return self._current()._scout_counts[self.model.space._agent_to_index[scout]]
@@ -0,0 +1,558 @@
+"""
+Parameter sweeps spread over many machines through a shared work queue.
+
+batch.sweep runs a whole sweep in one process pool.  Here a coordinator
+splits the sweep into work units (a few replicates of one parameter
+combination each) and puts them on a queue, any number of workers on any
+number of nodes take units off it, and the coordinator merges the finished
+units into the same CSV batch writes:
+
+    python -m src.sweep submit --queue sqlite:sweep.db --population 100 200 \\
+        --goal-x 900 4000 --replicates 1000 --unit-size 20
+    python -m src.sweep work --queue sqlite:sweep.db --workers 8     # on every node
+    python -m src.sweep merge --queue sqlite:sweep.db --out results.csv
+    python -m src.sweep status --queue sqlite:sweep.db
+
+or everything at once on this machine (submit, local workers, merging as
+units finish):
+
+    python -m src.sweep run --queue runs/queue --replicates 100 --workers 8
+
+Queues
+------
+    dir:PATH (or just PATH)  FileQueue, one JSON file per unit moved between
+                             pending/, running/, done/ and failed/ with atomic
+                             renames.  Works on any shared filesystem.
+    sqlite:PATH              SQLiteQueue, one table in an SQLite database.
+                             Handy for testing on one machine (SQLite locking
+                             is not safe on most network filesystems).
+
+Both have the same methods (put, claim, heartbeat, complete, fail,
+requeue_stale, retry_failed, finished, counts), so other backends can be
+plugged in by writing a class with those methods and passing it to Sweep or
+work.
+
+Failures and resuming
+---------------------
+A unit whose worker raised is put back on the queue until it failed
+max_attempts times, then it is parked in failed (submit --retry-failed
+queues those again).  Workers touch the units they hold between runs, and a
+unit nobody touched for lease seconds (its worker died) is put back as
+well.  Since a slow worker can still finish a unit that was handed out
+again, a unit may be run more than once.  Every run is deterministic (seeded
+like batch, by run_seed), so duplicates are identical and merge drops them.
+
+Submitting to a queue that already has units only adds the missing ones, and
+units whose runs are all in the output CSV already are skipped, so an
+interrupted sweep resumes by running the same command again.
+
+A queue holds one sweep (unit ids only say which runs of the grid they
+hold), use a new queue and output file for a different sweep.
+"""
+
+import argparse
+import contextlib
+import csv
+import json
+import os
+import sqlite3
+import time
+import traceback
+from concurrent.futures import ProcessPoolExecutor
+
+from .batch import SWEEP_DEFAULTS, SUMMARY_FIELDS, grid_points, _run
+from .recorder import _to_json
+from .rng import run_seed
+
+PENDING = "pending"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+STATES = (PENDING, RUNNING, DONE, FAILED)
+
+
+def _write_json(path, value):
+    # write then rename, so readers never see half a file
+    tmp = "{}.{}.tmp".format(path, os.getpid())
+    with open(tmp, "w") as f:
+        json.dump(value, f, default=_to_json)
+    os.replace(tmp, path)
+
+
+class FileQueue:
+    """
+    Work queue in a directory: one JSON file per unit under a directory per
+    state.  A unit is claimed by renaming it from pending/ to running/, which
+    only one worker can do.  The mtime of the running file is the unit's
+    heartbeat.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        for state in STATES:
+            os.makedirs(os.path.join(path, state), exist_ok=True)
+
+    def _file(self, state, unit_id):
+        return os.path.join(self.path, state, unit_id + ".json")
+
+    def _ids(self, state):
+        return sorted(name[:-5] for name in os.listdir(os.path.join(self.path, state)) if name.endswith(".json"))
+
+    def put(self, unit_id, payload):
+        """Queue a unit (a JSON-able dict) unless it is known already.  Returns True if it was added."""
+        if any(os.path.exists(self._file(state, unit_id)) for state in STATES):
+            return False
+        _write_json(self._file(PENDING, unit_id), {"payload": payload, "attempts": 0, "errors": []})
+        return True
+
+    def claim(self, worker):
+        """Take a pending unit.  Returns (unit_id, payload) or None if there is none."""
+        for unit_id in self._ids(PENDING):
+            running = self._file(RUNNING, unit_id)
+            try:
+                os.rename(self._file(PENDING, unit_id), running)
+            except FileNotFoundError:
+                # another worker was faster
+                continue
+            with open(running) as f:
+                unit = json.load(f)
+            unit["worker"] = worker
+            _write_json(running, unit)
+            return unit_id, unit["payload"]
+        return None
+
+    def heartbeat(self, unit_id):
+        try:
+            os.utime(self._file(RUNNING, unit_id))
+        except FileNotFoundError:
+            pass
+
+    def complete(self, unit_id, rows):
+        """Store the result rows of a unit and mark it done."""
+        _write_json(self._file(DONE, unit_id), {"rows": rows})
+        for state in (RUNNING, PENDING):
+            try:
+                os.remove(self._file(state, unit_id))
+            except FileNotFoundError:
+                pass
+
+    def fail(self, unit_id, error, max_attempts):
+        """Count a failed attempt, requeue the unit or park it in failed."""
+        self._retry(RUNNING, unit_id, error, max_attempts)
+
+    def _retry(self, state, unit_id, error, max_attempts):
+        path = self._file(state, unit_id)
+        try:
+            with open(path) as f:
+                unit = json.load(f)
+        except FileNotFoundError:
+            return
+        unit["attempts"] += 1
+        unit["errors"].append(error)
+        unit.pop("worker", None)
+        target = PENDING if unit["attempts"] < max_attempts else FAILED
+        _write_json(path, unit)
+        try:
+            os.rename(path, self._file(target, unit_id))
+        except FileNotFoundError:
+            pass
+
+    def requeue_stale(self, lease, max_attempts):
+        """Count units that haven't had a heartbeat for lease seconds as failed attempts."""
+        now = time.time()
+        stale = 0
+        for unit_id in self._ids(RUNNING):
+            try:
+                idle = now - os.path.getmtime(self._file(RUNNING, unit_id))
+            except FileNotFoundError:
+                continue
+            if idle > lease:
+                self._retry(RUNNING, unit_id, "no heartbeat for {:.0f} s".format(idle), max_attempts)
+                stale += 1
+        return stale
+
+    def retry_failed(self):
+        """Queue the failed units again with a fresh attempt count."""
+        for unit_id in self._ids(FAILED):
+            path = self._file(FAILED, unit_id)
+            with open(path) as f:
+                unit = json.load(f)
+            unit["attempts"] = 0
+            _write_json(path, unit)
+            os.rename(path, self._file(PENDING, unit_id))
+
+    def finished(self, skip=()):
+        """Yield (unit_id, rows) of the done units not in skip."""
+        for unit_id in self._ids(DONE):
+            if unit_id in skip:
+                continue
+            with open(self._file(DONE, unit_id)) as f:
+                yield unit_id, json.load(f)["rows"]
+
+    def counts(self):
+        """Number of units per state."""
+        return {state: len(self._ids(state)) for state in STATES}
+
+
+class SQLiteQueue:
+    """
+    Work queue in one SQLite table.  Claims happen inside an immediate
+    transaction so two workers never get the same unit.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._connection = None
+        self._pid = None
+        with self._transaction() as db:
+            db.execute(
+                "CREATE TABLE IF NOT EXISTS units ("
+                " id TEXT PRIMARY KEY, payload TEXT NOT NULL, state TEXT NOT NULL,"
+                " attempts INTEGER NOT NULL DEFAULT 0, errors TEXT NOT NULL DEFAULT '[]',"
+                " worker TEXT, heartbeat REAL, rows TEXT)"
+            )
+            db.execute("CREATE INDEX IF NOT EXISTS units_state ON units (state)")
+
+    @property
+    def db(self):
+        # connections can't cross a fork, open one per process
+        if self._pid != os.getpid():
+            self._connection = sqlite3.connect(self.path, timeout=60, isolation_level=None)
+            self._connection.execute("PRAGMA journal_mode=WAL")
+            self._pid = os.getpid()
+        return self._connection
+
+    def __getstate__(self):
+        # workers get the path and open their own connection
+        return {"path": self.path, "_connection": None, "_pid": None}
+
+    @contextlib.contextmanager
+    def _transaction(self):
+        db = self.db
+        db.execute("BEGIN IMMEDIATE")
+        try:
+            yield db
+        except BaseException:
+            db.execute("ROLLBACK")
+            raise
+        db.execute("COMMIT")
+
+    def put(self, unit_id, payload):
+        with self._transaction() as db:
+            cursor = db.execute(
+                "INSERT OR IGNORE INTO units (id, payload, state) VALUES (?, ?, ?)",
+                (unit_id, json.dumps(payload, default=_to_json), PENDING)
+            )
+        return cursor.rowcount == 1
+
+    def claim(self, worker):
+        with self._transaction() as db:
+            row = db.execute("SELECT id, payload FROM units WHERE state = ? ORDER BY id LIMIT 1", (PENDING,)).fetchone()
+            if row is None:
+                return None
+            db.execute(
+                "UPDATE units SET state = ?, worker = ?, heartbeat = ? WHERE id = ?",
+                (RUNNING, worker, time.time(), row[0])
+            )
+        return row[0], json.loads(row[1])
+
+    def heartbeat(self, unit_id):
+        with self._transaction() as db:
+            db.execute("UPDATE units SET heartbeat = ? WHERE id = ? AND state = ?", (time.time(), unit_id, RUNNING))
+
+    def complete(self, unit_id, rows):
+        with self._transaction() as db:
+            db.execute("UPDATE units SET state = ?, rows = ?, worker = NULL WHERE id = ?", (DONE, json.dumps(rows, default=_to_json), unit_id))
+
+    def fail(self, unit_id, error, max_attempts):
+        with self._transaction() as db:
+            self._retry(db, unit_id, error, max_attempts)
+
+    def _retry(self, db, unit_id, error, max_attempts):
+        row = db.execute("SELECT attempts, errors FROM units WHERE id = ? AND state = ?", (unit_id, RUNNING)).fetchone()
+        if row is None:
+            return
+        attempts = row[0] + 1
+        errors = json.loads(row[1]) + [error]
+        db.execute(
+            "UPDATE units SET state = ?, attempts = ?, errors = ?, worker = NULL WHERE id = ?",
+            (PENDING if attempts < max_attempts else FAILED, attempts, json.dumps(errors), unit_id)
+        )
+
+    def requeue_stale(self, lease, max_attempts):
+        with self._transaction() as db:
+            now = time.time()
+            stale = [unit_id for unit_id, in db.execute(
+                "SELECT id FROM units WHERE state = ? AND heartbeat < ?", (RUNNING, now - lease)
+            )]
+            for unit_id in stale:
+                self._retry(db, unit_id, "no heartbeat for {:.0f} s".format(lease), max_attempts)
+        return len(stale)
+
+    def retry_failed(self):
+        with self._transaction() as db:
+            db.execute("UPDATE units SET state = ?, attempts = 0 WHERE state = ?", (PENDING, FAILED))
+
+    def finished(self, skip=()):
+        ids = [unit_id for unit_id, in self.db.execute("SELECT id FROM units WHERE state = ? ORDER BY id", (DONE,))]
+        for unit_id in ids:
+            if unit_id in skip:
+                continue
+            row = self.db.execute("SELECT rows FROM units WHERE id = ?", (unit_id,)).fetchone()
+            yield unit_id, json.loads(row[0])
+
+    def counts(self):
+        counts = dict.fromkeys(STATES, 0)
+        counts.update(self.db.execute("SELECT state, COUNT(*) FROM units GROUP BY state"))
+        return counts
+
+
+def open_queue(spec):
+    """Open the queue described by "sqlite:PATH", "dir:PATH" or a plain directory PATH."""
+    kind, _, path = spec.partition(":")
+    if kind == "sqlite":
+        return SQLiteQueue(path)
+    if kind == "dir":
+        return FileQueue(path)
+    return FileQueue(spec)
+
+
+def run_unit(payload, heartbeat=None):
+    """
+    Run the runs of a work unit and return their summary rows (like
+    batch.sweep writes them).  heartbeat is called after every run.
+    """
+    options = payload["options"]
+    rows = []
+    for run, point, replicate, params, seed in payload["runs"]:
+        rows.append(_run((
+            run, point, replicate, params, seed, options["max_steps"], options["engine"], None,
+            options["stop_on_disconnect"], options["settle_speed"], options.get("metrics", False)
+        )))
+        if heartbeat is not None:
+            heartbeat()
+    return rows
+
+
+def work(queue, worker=None, lease=600, max_attempts=3, wait=False, poll=5):
+    """
+    Take units off queue and run them until it is empty.
+
+    Args:
+        queue: A queue object or a queue spec (see open_queue).
+        worker: Name recorded with claimed units (default: host:pid).
+        lease, max_attempts: See Sweep.
+        wait: Keep polling an empty queue until nothing is pending or
+            running anymore, instead of stopping right away (units held by
+            a dead worker come back after the lease).
+        poll: Seconds between polls while waiting.
+
+    Returns:
+        The number of units this worker finished.
+    """
+    if isinstance(queue, str):
+        queue = open_queue(queue)
+    worker = worker or "{}:{}".format(os.uname().nodename, os.getpid())
+    finished = 0
+    while True:
+        queue.requeue_stale(lease, max_attempts)
+        claimed = queue.claim(worker)
+        if claimed is None:
+            counts = queue.counts()
+            if not wait or counts[PENDING] + counts[RUNNING] == 0:
+                return finished
+            time.sleep(poll)
+            continue
+        unit_id, payload = claimed
+        try:
+            rows = run_unit(payload, lambda: queue.heartbeat(unit_id))
+        except Exception:
+            queue.fail(unit_id, traceback.format_exc(), max_attempts)
+            continue
+        queue.complete(unit_id, rows)
+        finished += 1
+
+
+class Sweep:
+    """
+    A parameter sweep run through a work queue.
+
+    Attributes:
+        queue: The work queue.
+        out: Path of the merged CSV.
+        merged_units: Ids of the units merged into out by this object.
+        merged_runs: Run numbers already in out.
+    """
+
+    def __init__(self, queue, out, grid=None, replicates=1, base_seed=0, unit_size=10, max_steps=5000,
+                 engine="array", stop_on_disconnect=True, settle_speed=None, lease=600, max_attempts=3,
+                 metrics=False):
+        """
+        Args:
+            queue: A queue object or a queue spec (see open_queue).
+            out: CSV file the finished runs are merged into.  Runs already
+                in it are skipped by submit and merge.
+            grid, replicates, base_seed, max_steps, engine,
+                stop_on_disconnect, settle_speed, metrics: As in batch.sweep
+                (only needed to submit).
+            unit_size: Runs (replicates of one combination) per work unit.
+            lease: Seconds without a heartbeat after which a running unit
+                is handed out again.
+            max_attempts: Failed attempts after which a unit is parked in
+                failed.
+        """
+        self.queue = open_queue(queue) if isinstance(queue, str) else queue
+        self.out = out
+        self.grid = grid or {}
+        self.replicates = replicates
+        self.base_seed = base_seed
+        self.unit_size = max(1, unit_size)
+        self.options = dict(
+            max_steps=max_steps, engine=engine, stop_on_disconnect=stop_on_disconnect, settle_speed=settle_speed,
+            metrics=metrics
+        )
+        self.lease = lease
+        self.max_attempts = max_attempts
+        self.merged_units = set()
+        self.merged_runs = set()
+        self._fields = None
+        if os.path.exists(out):
+            with open(out, newline="") as f:
+                reader = csv.DictReader(f)
+                self._fields = reader.fieldnames
+                self.merged_runs = {int(row["run"]) for row in reader}
+
+    def units(self):
+        """Yield (unit_id, payload) of every unit of the sweep, numbered like batch.sweep's runs."""
+        run = 0
+        for point, params in enumerate(grid_points(self.grid)):
+            for first in range(0, self.replicates, self.unit_size):
+                runs = []
+                for replicate in range(first, min(first + self.unit_size, self.replicates)):
+                    runs.append((run, point, replicate, params, run_seed(self.base_seed, point, replicate)))
+                    run += 1
+                unit_id = "p{:06d}_r{:06d}".format(point, first)
+                yield unit_id, {"runs": runs, "options": self.options}
+
+    def submit(self, retry_failed=False):
+        """
+        Queue the units that aren't on the queue or in out yet.
+
+        Returns:
+            The number of units added.
+        """
+        if retry_failed:
+            self.queue.retry_failed()
+        added = 0
+        for unit_id, payload in self.units():
+            if all(run[0] in self.merged_runs for run in payload["runs"]):
+                continue
+            added += self.queue.put(unit_id, payload)
+        return added
+
+    def merge(self):
+        """
+        Append the runs of newly finished units to out.
+
+        Returns:
+            The number of rows written.
+        """
+        written = 0
+        f = writer = None
+        try:
+            for unit_id, rows in self.queue.finished(self.merged_units):
+                rows = [row for row in rows if row["run"] not in self.merged_runs]
+                if rows and writer is None:
+                    new = self._fields is None
+                    if new:
+                        self._fields = SUMMARY_FIELDS + [name for name in rows[0] if name not in SUMMARY_FIELDS]
+                    f = open(self.out, "a", newline="")
+                    writer = csv.DictWriter(f, self._fields)
+                    if new:
+                        writer.writeheader()
+                for row in rows:
+                    writer.writerow(row)
+                    self.merged_runs.add(row["run"])
+                written += len(rows)
+                self.merged_units.add(unit_id)
+        finally:
+            if f is not None:
+                f.close()
+        return written
+
+    def run(self, workers=None, poll=2):
+        """
+        Submit, run the units with local worker processes and merge them as
+        they finish.  Other nodes can work on the same queue meanwhile.
+
+        Returns:
+            The queue's unit counts at the end.
+        """
+        self.submit()
+        workers = workers or os.cpu_count()
+        with ProcessPoolExecutor(workers) as pool:
+            futures = [
+                pool.submit(work, self.queue, None, self.lease, self.max_attempts, True)
+                for _ in range(workers)
+            ]
+            while not all(future.done() for future in futures):
+                self.merge()
+                time.sleep(poll)
+            for future in futures:
+                future.result()
+        self.merge()
+        return self.queue.counts()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("command", choices=("submit", "work", "merge", "run", "status"))
+    parser.add_argument("--queue", required=True, help="sqlite:PATH, dir:PATH or a directory")
+    parser.add_argument("--out", default="results.csv")
+    for name, default in SWEEP_DEFAULTS.items():
+        parser.add_argument("--" + name.replace("_", "-"), type=type(default), nargs="+", default=[default])
+    parser.add_argument("--replicates", type=int, default=1)
+    parser.add_argument("--unit-size", type=int, default=10, help="runs per work unit")
+    parser.add_argument("--max-steps", type=int, default=5000)
+    parser.add_argument("--seed", type=int, default=0, help="base seed of the sweep")
+    parser.add_argument("--engine", choices=("agent", "array"), default="array")
+    parser.add_argument("--keep-disconnected", action="store_true",
+                        help="don't stop disconnected runs, only record when they disconnected")
+    parser.add_argument("--settle-speed", type=float, default=None,
+                        help="stop runs whose uninformed bees' mean speed stays below this")
+    parser.add_argument("--metrics", action="store_true",
+                        help="add summaries of the streaming swarm metrics (see metrics.py) to every row")
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--lease", type=float, default=600,
+                        help="seconds without a heartbeat before a unit is handed out again")
+    parser.add_argument("--max-attempts", type=int, default=3)
+    parser.add_argument("--retry-failed", action="store_true", help="queue failed units again (submit)")
+    parser.add_argument("--wait", action="store_true",
+                        help="work: keep waiting while other workers hold units")
+    args = parser.parse_args(argv)
+
+    grid = {name: getattr(args, name) for name in SWEEP_DEFAULTS}
+    sweep = Sweep(
+        args.queue, args.out, grid, args.replicates, args.seed, args.unit_size, args.max_steps, args.engine,
+        not args.keep_disconnected, args.settle_speed, args.lease, args.max_attempts, args.metrics
+    )
+    if args.command == "submit":
+        print("queued {} units".format(sweep.submit(args.retry_failed)))
+    elif args.command == "work":
+        workers = args.workers or os.cpu_count()
+        with ProcessPoolExecutor(workers) as pool:
+            futures = [
+                pool.submit(work, args.queue, None, args.lease, args.max_attempts, args.wait)
+                for _ in range(workers)
+            ]
+            print("finished {} units".format(sum(future.result() for future in futures)))
+    elif args.command == "merge":
+        print("merged {} runs into {}".format(sweep.merge(), args.out))
+    elif args.command == "run":
+        counts = sweep.run(args.workers)
+        print("{} runs in {}, units: {}".format(len(sweep.merged_runs), args.out, counts))
+    print(json.dumps(sweep.queue.counts()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,108 @@
+"""
+Stopping conditions for headless runs.
+
+    model = BoidFlockers(termination=Termination(max_ticks=5000))
+    while model.running:
+        model.step()
+    model.stop_reason   # "arrived", "disconnected", "max_steps", ...
+
+A Termination is checked when the model is built and after every step, so a
+run that starts in a stopping state never steps.  When a condition holds it
+sets model.running to False (which also ends Mesa's run_model and stops the
+server's playback) and records the reason in model.stop_reason.
+
+All the conditions only read things the model already computes every tick
+(the swarm stats, the active mask and the velocity array), so checking them
+costs next to nothing compared to a step.
+"""
+
+import numpy as np
+
+ARRIVED = "arrived"
+DISCONNECTED = "disconnected"
+SCOUTS_GONE = "scouts_gone"
+SETTLED = "settled"
+MAX_STEPS = "max_steps"
+ERROR = "error"
+STOP_REASONS = (ARRIVED, DISCONNECTED, SCOUTS_GONE, SETTLED, MAX_STEPS, ERROR)
+
+
+class Termination:
+    """
+    Checks a BoidFlockers model for the end of a run.  The conditions are
+    checked in this order and the first one that holds is the stop reason:
+
+        arrived       the swarm center (main component) is within
+                      params.arrival_radius of the goal (the scouts
+                      already start leaving at params.close_to_goal)
+        disconnected  an uninformed bee is outside the main component
+        scouts_gone   every scout left (Scout.disappear)
+        settled       the mean speed of the uninformed bees stayed below
+                      settle_speed for settle_ticks ticks in a row
+        max_steps     max_ticks steps were taken
+
+    Attributes:
+        reason: Why the model stopped, None while it is running.
+        stopped_at: Step count when it stopped.
+    """
+
+    def __init__(self, max_ticks=None, arrival=True, disconnect=True, scouts_gone=True,
+                 settle_speed=None, settle_ticks=10, every=1):
+        """
+        Args:
+            max_ticks: Step budget, None for no limit.
+            arrival, disconnect, scouts_gone: Turn those conditions on/off.
+            settle_speed: Mean speed below which the swarm counts as
+                settled.  None turns the condition off.
+            settle_ticks: Consecutive checks the speed has to stay below
+                settle_speed.
+            every: Only check every this many steps (max_ticks is always
+                checked).
+        """
+        self.max_ticks = max_ticks
+        self.arrival = arrival
+        self.disconnect = disconnect
+        self.scouts_gone = scouts_gone
+        self.settle_speed = settle_speed
+        self.settle_ticks = settle_ticks
+        self.every = max(1, every)
+        self.reason = None
+        self.stopped_at = None
+        self._settled_for = 0
+
+    def condition(self, model):
+        """Return the stop reason that holds for the model now, or None."""
+        steps = model.schedule.steps
+        if steps % self.every == 0:
+            stats = model.stats
+            if self.arrival and np.linalg.norm(model.goal - stats.center) < model.params.arrival_radius:
+                return ARRIVED
+            if self.disconnect and stats.n_disconnected > 0:
+                return DISCONNECTED
+            if self.scouts_gone and model.scout_population > 0 and not (model.active & ~model.uninformed).any():
+                return SCOUTS_GONE
+            # uninformed bees start at rest, so don't count the first tick
+            if self.settle_speed is not None and steps > 0:
+                speed = np.linalg.norm(model.get_velocities()[model.uninformed], axis=1).mean()
+                self._settled_for = self._settled_for + 1 if speed < self.settle_speed else 0
+                if self._settled_for >= self.settle_ticks:
+                    return SETTLED
+        if self.max_ticks is not None and steps >= self.max_ticks:
+            return MAX_STEPS
+        return None
+
+    def check(self, model):
+        """Stop the model if a condition holds.  Returns the reason or None."""
+        if self.reason is not None:
+            return self.reason
+        reason = self.condition(model)
+        if reason is not None:
+            self.stop(model, reason)
+        return reason
+
+    def stop(self, model, reason):
+        """Stop the model for the given reason (e.g. ERROR from the caller)."""
+        self.reason = reason
+        self.stopped_at = model.schedule.steps
+        model.running = False
+        model.stop_reason = reason
@@ -0,0 +1,46 @@
+"""
+Shared pieces of the tests: reference values computed with the per-agent
+Boid code and small recordings.
+"""
+
+import numpy as np
+
+from src.boid import Boid
+from src.model import BoidFlockers
+from src.recorder import TrajectoryRecorder
+
+
+def boid_accelerations(model, rows):
+    """
+    The clamped steering vectors Boid.step would compute for the uninformed
+    bees at rows, from the model's current state.
+    """
+    params = model.params
+    agents = model.space._index_to_agent
+    out = np.empty((len(rows), 2))
+    for k, row in enumerate(rows):
+        boid = agents[row]
+        assert isinstance(boid, Boid)
+        neighbors = model.space.get_neighbors(boid.pos, boid.vision, False)
+        v_new = boid.cohere(neighbors) * boid.cohere_factor + boid.separate(neighbors) * boid.separate_factor
+        if model.schedule.steps > 4:
+            v_new = v_new + boid.match_heading(neighbors) * boid.match_factor
+        if params.weight_random:
+            v_new = v_new + boid.random() * params.weight_random
+        norm = np.linalg.norm(v_new)
+        if norm > params.max_accel:
+            v_new = params.max_accel * v_new / norm
+        out[k] = v_new
+    return out
+
+
+def record(path, ticks, population=20, **kwargs):
+    """Record ticks steps of a small model to path, return the positions of every frame."""
+    model = BoidFlockers(population=population, scout_population=2, seed=0)
+    recorder = TrajectoryRecorder(path, model, chunk_ticks=8, **kwargs)
+    frames = [model.space._agent_points.copy()]
+    for _ in range(ticks):
+        model.step()
+        frames.append(model.space._agent_points.copy())
+    recorder.close(model)
+    return np.array(frames, dtype=np.float32)
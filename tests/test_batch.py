@@ -0,0 +1,37 @@
+import math
+
+import pytest
+
+from src.batch import layout, make_model, run_trial
+from src.termination import ERROR, MAX_STEPS
+
+
+def test_default_layout_unchanged():
+    kwargs, offset = layout({"population": 100})
+    assert not offset.any()
+    assert kwargs["params"].u_start_center == (150, 150)
+    assert (kwargs["width"], kwargs["height"]) == (1200, 400)
+
+
+@pytest.mark.parametrize("population", [500, 2000])
+def test_large_population_fits(population):
+    model = make_model({"population": population, "scout_population": 10}, seed=1)
+    points = model.space._agent_points
+    assert (points >= 0).all()
+    assert (points[:, 0] < model.space.x_max).all() and (points[:, 1] < model.space.y_max).all()
+    # the goal moved with the start square
+    assert tuple(model.goal - model.params.u_start_center) == (900 - 150, 150 - 150)
+
+
+@pytest.mark.parametrize("population", [20, 500, 2000])
+def test_large_population_starts_connected(population):
+    result = run_trial({"population": population}, seed=1, max_steps=20)
+    assert result["stop_reason"] == MAX_STEPS
+    assert result["steps"] == 20 and result["n_disconnected"] == 0
+
+
+def test_build_error_is_a_row():
+    result = run_trial({"close_to_goal": -1}, seed=0, max_steps=5, metrics=True)
+    assert result["stop_reason"] == ERROR
+    assert "close_to_goal" in result["error"]
+    assert math.isnan(result["spread_mean"])
@@ -0,0 +1,40 @@
+import numpy as np
+import pytest
+
+from src import checkpoint
+from src.model import BoidFlockers
+
+
+def run(ticks, **kwargs):
+    model = BoidFlockers(population=60, scout_population=6, seed=5, **kwargs)
+    for _ in range(ticks):
+        model.step()
+    return model
+
+
+@pytest.mark.parametrize("kwargs", [dict(engine="agent"), dict(engine="array"),
+                                    dict(engine="array", update="sequential")])
+def test_same_run_as_regular_agents(kwargs):
+    regular = run(80, **kwargs)
+    compact = run(80, compact=True, **kwargs)
+    assert np.array_equal(compact.space._agent_points, regular.space._agent_points)
+    assert np.array_equal(compact.get_velocities(), regular.get_velocities())
+
+
+def test_no_instance_dict():
+    model = run(1, engine="array", compact=True)
+    for agent in model.schedule.agents:
+        assert not hasattr(agent, "__dict__")
+        with pytest.raises(AttributeError):
+            agent.foo = 1
+
+
+def test_checkpoint_round_trip(tmp_path):
+    model = run(30, engine="array", compact=True)
+    checkpoint.save(model, str(tmp_path / "run.ckpt"))
+    for _ in range(30):
+        model.step()
+    restored = checkpoint.load(str(tmp_path / "run.ckpt"))
+    for _ in range(30):
+        restored.step()
+    assert np.array_equal(restored.space._agent_points, model.space._agent_points)
@@ -0,0 +1,38 @@
+import numpy as np
+
+from src.model import BoidFlockers
+from src.neighbors import CellList
+from src.params import SwarmParams
+from src.stats import connected_components
+
+
+def components_from_scratch(model):
+    points = model.space._agent_points
+    rows = np.nonzero(model.active)[0]
+    which, j, _, _ = CellList(points, model.vision).pairs(rows, model.vision)
+    keep = model.active[j]
+    return connected_components(len(points), rows[which[keep]], j[keep])
+
+
+def test_incremental_matches_from_scratch():
+    # sparse enough start that bees drift apart and join up again, and the
+    # goal is close enough for the scouts to reset and then leave
+    model = BoidFlockers(population=60, seed=1, engine="array", params=SwarmParams(goal_x=400, u_start_spacing=25))
+    tracker = model.stats.connectivity
+    disconnected = resets = 0
+    for _ in range(400):
+        scout_x = model.space._agent_points[~model.uninformed, 0].copy()
+        model.step()
+        labels = model.stats.labels
+        expected = components_from_scratch(model)
+        assert np.array_equal(labels, expected)
+        sizes = np.bincount(expected[model.active])
+        assert model.stats.n_components == np.count_nonzero(sizes)
+        main = expected == sizes.argmax()
+        assert model.stats.n_disconnected == np.count_nonzero(model.active & model.uninformed & ~main)
+        disconnected += model.stats.n_disconnected > 0
+        resets += np.count_nonzero(model.space._agent_points[~model.uninformed, 0] < scout_x - 1)
+    # the run went through everything the tracker has to handle
+    assert 0 < disconnected < 400
+    assert resets > 0 and not model.active[~model.uninformed].any()
+    assert tracker.incremental_updates > 0 and tracker.full_updates > 1
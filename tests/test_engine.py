@@ -0,0 +1,57 @@
+import numpy as np
+import pytest
+
+from src.model import BoidFlockers
+from src.params import SwarmParams
+
+from .helpers import boid_accelerations
+
+
+def run(population, ticks, **kwargs):
+    model = BoidFlockers(population=population, scout_population=population // 10, seed=7, **kwargs)
+    for _ in range(ticks):
+        model.step()
+    return model
+
+
+@pytest.mark.parametrize("population", [20, 60, 150])
+@pytest.mark.parametrize("weight_random", [0.0, 0.3])
+def test_sequential_matches_agent_path(population, weight_random):
+    # with weight_random every bee also reads its row of the tick's draws
+    params = SwarmParams(weight_random=weight_random)
+    agent = run(population, 60, engine="agent", params=params)
+    array = run(population, 60, engine="array", update="sequential", params=params)
+    assert np.allclose(array.space._agent_points, agent.space._agent_points)
+    assert np.allclose(array.get_velocities(), agent.get_velocities())
+    assert np.array_equal(array.active, agent.active)
+
+
+@pytest.mark.parametrize("ticks", [0, 3, 10])
+def test_synchronous_forces_match_boid(ticks):
+    # freeze the model after a few ticks (align only starts after 4) and
+    # compare the engine's forces with the Boid methods on that snapshot
+    model = run(60, ticks, engine="array", update="synchronous")
+    engine = model.engine
+    rows = engine.boid_rows
+    pairs = model.stats.index.pairs(rows, model.vision)
+    expected = boid_accelerations(model, rows)
+    assert np.allclose(engine.accelerations(rows, *pairs, engine.velocity), expected)
+
+
+@pytest.mark.parametrize("weight_random", [0.0, 0.3])
+def test_numba_backend_matches_numpy(weight_random):
+    pytest.importorskip("numba")
+    params = SwarmParams(weight_random=weight_random)
+    numpy = run(100, 30, engine="array", backend="numpy", params=params)
+    numba = run(100, 30, engine="array", backend="numba", params=params)
+    assert np.allclose(numba.space._agent_points, numpy.space._agent_points)
+    assert np.allclose(numba.get_velocities(), numpy.get_velocities())
+
+
+@pytest.mark.parametrize("update", ["synchronous", "sequential"])
+def test_profiled_like_agent_path(update):
+    agent = run(40, 6, engine="agent", profile=True).profiler.last
+    array = run(40, 6, engine="array", update=update, profile=True).profiler.last
+    assert array["neighbor_queries"] == agent["neighbor_queries"] > 0
+    assert {"neighbors", "forces", "move"} <= set(array["phases"])
+    assert array["agents"]["uninformed"] > 0
@@ -0,0 +1,28 @@
+import numpy as np
+
+from src.ensemble import Ensemble
+from src.params import SwarmParams
+from src.termination import ARRIVED, DISCONNECTED, SCOUTS_GONE
+
+
+def test_scouts_leave_near_the_goal():
+    ensemble = Ensemble(4, population=100, params=SwarmParams(goal_x=400), seed=1)
+    n, s = ensemble.population, ensemble.scout_population
+    ensemble.run(2000)
+    assert set(ensemble.stop_reason) <= {ARRIVED, DISCONNECTED, SCOUTS_GONE}
+    assert ARRIVED in ensemble.stop_reason
+    # every replicate got within close_to_goal and counted its scouts down
+    scouts_left = ensemble.active[:, n:].sum(axis=1)
+    assert (scouts_left < s).all()
+    assert (ensemble.leave_counter < np.arange(s)).any(axis=1).all()
+    assert [r["scouts_left"] for r in ensemble.results()] == scouts_left.tolist()
+
+
+def test_scouts_gone_without_arrival():
+    ensemble = Ensemble(4, population=100, params=SwarmParams(goal_x=400, arrival_radius=0), seed=1)
+    n = ensemble.population
+    ensemble.run(2000)
+    assert ARRIVED not in ensemble.stop_reason
+    gone = ensemble.stop_reason == SCOUTS_GONE
+    assert gone.any()
+    assert not ensemble.active[gone, n:].any()
@@ -0,0 +1,54 @@
+import numpy as np
+import pytest
+
+from src import kernels
+from src.model import BoidFlockers
+from src.neighbors import CellList
+
+from .helpers import boid_accelerations
+
+
+@pytest.fixture(params=[0, 3, 10])
+def snapshot(request):
+    """A model frozen after a few ticks (align only starts after 4) and its cell list."""
+    model = BoidFlockers(population=80, scout_population=8, engine="array", seed=3)
+    for _ in range(request.param):
+        model.step()
+    index = CellList(model.space._agent_points.copy(), model.space.cell_size)
+    return model, index
+
+
+def kernel_args(model):
+    params = model.params
+    rows = model.engine.boid_rows
+    return dict(
+        rows=rows, vel=model.engine.velocity, vision=model.vision, separation=model.separation,
+        factors=model.factors, alpha=params.alpha, vmax=params.vmax, max_accel=params.max_accel,
+        align=model.schedule.steps > 4, random=model.engine._kernel_random(rows)
+    )
+
+
+@pytest.fixture
+def plain_kernel(monkeypatch):
+    # the uncompiled loops, whether or not numba is installed
+    python = getattr(kernels._steer_cells, "py_func", kernels._steer_cells)
+    monkeypatch.setattr(kernels, "_steer_cells", python)
+    monkeypatch.setattr(kernels, "prange", range)
+    monkeypatch.setattr(kernels, "_compiled", True)
+
+
+def test_plain_kernel_matches_boid(snapshot, plain_kernel):
+    model, index = snapshot
+    args = kernel_args(model)
+    v_new, found = kernels.steer_cells(index, **args)
+    assert np.allclose(v_new, boid_accelerations(model, args["rows"]))
+    assert found == len(index.pairs(args["rows"], model.vision)[0])
+
+
+def test_numba_kernel_matches_boid(snapshot):
+    pytest.importorskip("numba")
+    model, index = snapshot
+    args = kernel_args(model)
+    v_new, found = kernels.steer_cells(index, **args)
+    assert np.allclose(v_new, boid_accelerations(model, args["rows"]))
+    assert found == len(index.pairs(args["rows"], model.vision)[0])
@@ -0,0 +1,47 @@
+import numpy as np
+
+from src import checkpoint
+from src.metrics import METRICS, DecimatedSeries, RunningStats
+from src.model import BoidFlockers
+
+
+def test_running_stats_match_numpy():
+    values = np.random.default_rng(0).normal(3, 2, 1000)
+    stats, first, second = RunningStats(), RunningStats(), RunningStats()
+    for value in values:
+        stats.add(value)
+    for value in values[:300]:
+        first.add(value)
+    for value in values[300:]:
+        second.add(value)
+    first.merge(second)
+    for s in (stats, first):
+        assert np.isclose(s.mean, values.mean())
+        assert np.isclose(s.variance, values.var(ddof=1))
+        assert (s.min, s.max) == (values.min(), values.max())
+
+
+def test_decimated_series_spans_run():
+    series = DecimatedSeries(8)
+    for tick in range(100):
+        series.add(tick, tick)
+    assert len(series.ticks) <= 8
+    assert series.ticks[0] == 0 and series.ticks[-1] > 80
+    assert np.all(series.ticks % series.stride == 0)
+
+
+def test_checkpoint_keeps_metrics(tmp_path):
+    path = str(tmp_path / "run.ckpt")
+    model = BoidFlockers(population=60, scout_population=6, seed=2, engine="array", metrics=True)
+    for _ in range(30):
+        model.step()
+    checkpoint.save(model, path)
+    for _ in range(30):
+        model.step()
+    restored = checkpoint.load(path)
+    for _ in range(30):
+        restored.step()
+    assert restored.metrics.summary() == model.metrics.summary()
+    for name in METRICS:
+        assert all(np.array_equal(a, b) for a, b in zip(restored.metrics.series(name), model.metrics.series(name)))
+    assert checkpoint.load(path, metrics=False).metrics is None
@@ -0,0 +1,26 @@
+import tracemalloc
+
+from src.model import BoidFlockers
+from src.profiling import TickProfiler
+
+
+def test_churn_shows_in_peak_not_net():
+    profiler = TickProfiler(track_allocations=True)
+    try:
+        profiler.begin_tick(0)
+        churn = bytearray(10 ** 6)
+        del churn
+        record = profiler.end_tick(1)
+    finally:
+        tracemalloc.stop()
+    assert record["peak_bytes"] >= 10 ** 6
+    assert record["net_bytes"] < 10 ** 5
+    assert abs(record["net_blocks"]) < 100
+
+
+def test_model_record_fields():
+    model = BoidFlockers(population=30, scout_population=3, seed=0, profile=True)
+    model.step()
+    record = model.profiler.last
+    assert {"tick", "wall", "phases", "agents", "neighbor_queries", "mean_neighbors", "net_blocks"} <= set(record)
+    assert "net_bytes" not in record
@@ -0,0 +1,36 @@
+import numpy as np
+import pytest
+
+from src.recorder import Trajectory
+
+from .helpers import record
+
+
+def test_round_trip(tmp_path):
+    frames = record(tmp_path, 20)
+    trajectory = Trajectory(tmp_path)
+    assert len(trajectory) == 21
+    assert np.array_equal(trajectory.positions(), frames)
+    assert np.array_equal(trajectory.positions(slice(3, 19, 5)), frames[3:19:5])
+    assert np.array_equal(trajectory.positions(7), frames[7])
+    assert np.array_equal(trajectory.positions(-1), frames[-1])
+    assert np.array_equal(trajectory.positions(np.int64(-21)), frames[0])
+
+
+@pytest.mark.parametrize("tick", [21, 25, -22])
+def test_tick_out_of_range(tmp_path, tick):
+    record(tmp_path, 20)
+    with pytest.raises(IndexError):
+        Trajectory(tmp_path).positions(tick)
+
+
+def test_refuses_old_recording(tmp_path):
+    record(tmp_path, 40, population=100)
+    with pytest.raises(FileExistsError):
+        record(tmp_path, 20)
+    frames = record(tmp_path, 20, overwrite=True)
+    trajectory = Trajectory(tmp_path)
+    assert len(trajectory) == 21 and trajectory.n_agents == 22
+    assert sorted(p.name for p in tmp_path.glob("pos_*.npy")) == ["pos_00000.npy", "pos_00001.npy", "pos_00002.npy"]
+    assert np.array_equal(trajectory.positions(), frames)
+
@@ -0,0 +1,48 @@
+import json
+
+from src.live import FrameBuffer, Simulation, UNPACED_PAGE_JS
+from src.replay import ReplayCanvas, ReplayModel, make_server
+
+from .helpers import record
+
+
+def play(path, **kwargs):
+    """Run a replay Simulation to the end in this thread, return the ticks of its frames."""
+    buffer = FrameBuffer()
+    canvas = ReplayCanvas(styles_every_frame=True)
+    ticks = []
+
+    def on_frame():
+        ticks.append(simulation.model.tick)
+        if buffer.latest()[2]:
+            simulation.stop()
+
+    simulation = Simulation(lambda: ReplayModel(path, **kwargs), lambda m: [canvas.render(m)], buffer,
+                            fps=None, on_frame=on_frame)
+    simulation.run()
+    return ticks, buffer
+
+
+def test_every_frame_is_published(tmp_path):
+    record(tmp_path, 30)
+    ticks, buffer = play(str(tmp_path))
+    assert ticks == list(range(31))
+    assert buffer.seq == 31
+    # every frame carries the styles, for viewers joining mid-run
+    assert "styles" in json.loads(buffer.latest()[1])["data"][0]
+
+
+def test_frame_skip_and_start(tmp_path):
+    record(tmp_path, 30)
+    ticks, _ = play(str(tmp_path), start_tick=4, frame_skip=8)
+    assert ticks == [4, 12, 20, 28, 30]
+
+
+def test_server_paces_playback(tmp_path):
+    record(tmp_path, 5)
+    server = make_server(str(tmp_path), rate=120)
+    server.simulation.stop()
+    assert server.simulation.tps == 120 and server.simulation.fps is None
+    assert server.restart_on_reset
+    # the page doesn't wait between frames, so the 20 fps slider doesn't cap it
+    assert UNPACED_PAGE_JS in server.js_code
@@ -0,0 +1,53 @@
+import csv
+
+import pytest
+
+from src.sweep import FileQueue, SQLiteQueue, Sweep, run_unit, work, DONE, FAILED, PENDING
+
+
+@pytest.fixture(params=["dir", "sqlite"])
+def make_queue(request, tmp_path):
+    def make(name):
+        if request.param == "dir":
+            return FileQueue(str(tmp_path / name))
+        return SQLiteQueue(str(tmp_path / (name + ".db")))
+    return make
+
+
+def read_runs(path):
+    with open(path, newline="") as f:
+        return sorted(int(row["run"]) for row in csv.DictReader(f))
+
+
+def test_resubmit_skips_merged_runs(make_queue, tmp_path):
+    out = str(tmp_path / "results.csv")
+    grid = {"population": [20, 30]}
+    sweep = Sweep(make_queue("first"), out, grid, replicates=3, unit_size=2, max_steps=3)
+    assert sweep.submit() == 4
+    # already queued
+    assert sweep.submit() == 0
+    # the sweep gets interrupted after one unit
+    unit_id, payload = sweep.queue.claim("test")
+    sweep.queue.complete(unit_id, run_unit(payload))
+    assert sweep.merge() == 2
+    assert read_runs(out) == [0, 1]
+
+    # a new coordinator on a fresh queue resumes from the CSV
+    resumed = Sweep(make_queue("second"), out, grid, replicates=3, unit_size=2, max_steps=3)
+    assert resumed.submit() == 3
+    assert work(resumed.queue) == 3
+    assert resumed.merge() == 4
+    assert read_runs(out) == list(range(6))
+    assert Sweep(make_queue("third"), out, grid, replicates=3, unit_size=2).submit() == 0
+
+
+def test_failing_unit_ends_in_failed(make_queue):
+    queue = make_queue("queue")
+    # options are missing, run_unit raises a KeyError every time
+    queue.put("bad", {"runs": [[0, 0, 0, {}, 1]], "options": {}})
+    assert work(queue, max_attempts=3) == 0
+    assert queue.counts()[FAILED] == 1 and queue.counts()[PENDING] == 0
+    assert list(queue.finished()) == []
+    queue.retry_failed()
+    assert queue.counts()[PENDING] == 1
+    assert queue.counts()[DONE] == 0
@@ -0,0 +1,58 @@
+import pytest
+
+from src.model import BoidFlockers
+from src.params import SwarmParams
+from src.termination import (
+    Termination, ARRIVED, DISCONNECTED, SCOUTS_GONE, SETTLED, MAX_STEPS, ERROR
+)
+
+
+def run(termination, max_steps=400, **kwargs):
+    model = BoidFlockers(seed=0, engine="array", termination=termination, **kwargs)
+    while model.running and model.schedule.steps < max_steps:
+        model.step()
+    return model
+
+
+def test_arrived_after_scouts_started_leaving():
+    model = run(Termination())
+    assert model.stop_reason == ARRIVED
+    # arrival_radius < close_to_goal, so some scouts left before it arrived
+    assert 0 < (model.active & ~model.uninformed).sum() < model.scout_population
+
+
+def test_scouts_gone_without_arrival():
+    model = run(Termination(), params=SwarmParams(arrival_radius=0))
+    assert model.stop_reason == SCOUTS_GONE
+    assert not (model.active & ~model.uninformed).any()
+
+
+def test_arrived_at_start():
+    # checked when the model is built, so it never steps
+    model = run(Termination(), params=SwarmParams(goal_x=150, goal_y=150))
+    assert model.stop_reason == ARRIVED and model.schedule.steps == 0
+
+
+def test_disconnected():
+    model = run(Termination(), population=20, params=SwarmParams(u_start_spacing=60))
+    assert model.stop_reason == DISCONNECTED
+    assert model.termination.stopped_at == model.schedule.steps
+
+
+def test_settled():
+    termination = Termination(arrival=False, disconnect=False, settle_speed=100, settle_ticks=3)
+    model = run(termination)
+    assert model.stop_reason == SETTLED and model.schedule.steps == 3
+
+
+@pytest.mark.parametrize("every", [1, 4])
+def test_max_steps(every):
+    model = run(Termination(max_ticks=7, every=every))
+    assert model.stop_reason == MAX_STEPS and model.schedule.steps == 7
+
+
+def test_error_from_caller():
+    model = run(Termination(max_ticks=2))
+    model.termination.stop(model, ERROR)
+    assert model.stop_reason == ERROR and not model.running
+    assert model.termination.check(model) == ERROR